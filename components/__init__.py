@@ -1,6 +1,10 @@
+from components.edit_grid import edit_grid
+from components.export_button import export_button
 from components.login_form import init_session_state, logout
 
 __all__ = [
+    'edit_grid',
+    'export_button',
     'login_form',
     'init_session_state',
     'logout',
@@ -0,0 +1,102 @@
+import streamlit as st
+
+from lib.scheduler import get_scheduler
+
+
+def collect_changes(frame, key_column, edited_rows, editable_columns):
+    """
+    把 data_editor 记录的改动单元格转换为按主键组织的改动
+
+    Args:
+        frame: 传给 data_editor 的 DataFrame（edited_rows 中的行位置相对于它）
+        key_column: 主键字段
+        edited_rows: data_editor 状态中的 edited_rows，{行位置: {字段: 新值}}
+        editable_columns: 允许写回的字段
+
+    Returns:
+        {主键: {字段: 新值}}，与原值相同的单元格不计入
+    """
+    changes = {}
+    for position, values in edited_rows.items():
+        position = int(position)
+        if position >= len(frame):
+            continue
+        row = frame.iloc[position]
+        changed = {column: value for column, value in values.items()
+                   if column in editable_columns and value != row[column]}
+        if changed:
+            key = row[key_column]
+            changes[key.item() if hasattr(key, 'item') else key] = changed
+    return changes
+
+
+def edit_grid(db, table, key_column, frame, editable_columns, key, refresh_job=None, height=800):
+    """
+    可编辑表格组件：只跟踪改动的单元格，保存时在一个事务中批量写回
+
+    data_editor 按行位置记录改动，而传入的列表会被后台刷新重新排序；因此有未保存的改动时
+    固定显示开始编辑时的副本，改动按该副本的行位置对应主键，保存或放弃之后再换成最新数据。
+
+    Args:
+        db: 数据库管理器
+        table: 表名
+        key_column: 主键字段
+        frame: 要编辑的 DataFrame
+        editable_columns: 可编辑的字段，其余字段只读
+        key: 组件 key
+        refresh_job: 保存后需要立即刷新的后台任务名
+        height: 表格高度
+    """
+    message_key = f"{key}_saved"
+    frame_key = f"{key}_frame"
+    if message_key in st.session_state:
+        st.success(st.session_state.pop(message_key))
+
+    edited_rows = st.session_state.get(key, {}).get('edited_rows', {})
+    if not edited_rows or frame_key not in st.session_state:
+        st.session_state[frame_key] = frame.copy()
+    frame = st.session_state[frame_key]
+
+    st.data_editor(
+        frame,
+        key=key,
+        height=height,
+        hide_index=True,
+        num_rows="fixed",
+        disabled=[column for column in frame.columns if column not in editable_columns],
+        use_container_width=True,
+    )
+
+    changes = collect_changes(frame, key_column, edited_rows, editable_columns)
+    cells = sum(len(values) for values in changes.values())
+
+    save_col, discard_col, info_col = st.columns([1, 1, 4])
+    with save_col:
+        save = st.button("💾保存", disabled=not changes, key=f"{key}_save", use_container_width=True)
+    with discard_col:
+        discard = st.button("放弃修改", disabled=not edited_rows, key=f"{key}_discard", use_container_width=True)
+    with info_col:
+        if edited_rows:
+            st.caption(f"{len(changes)} 行 {cells} 个单元格待保存，保存前列表不随后台刷新更新")
+        else:
+            st.caption("0 行 0 个单元格待保存")
+
+    if discard:
+        del st.session_state[key]
+        st.session_state.pop(frame_key, None)
+        st.rerun()
+
+    if save:
+        try:
+            result = db.update_many(table, key_column, changes, touch="updated_at")
+        except Exception as e:
+            st.error(f"保存失败: {e}")
+            return
+        # 清除编辑状态，并在重新渲染前让列表读到新数据
+        del st.session_state[key]
+        st.session_state.pop(frame_key, None)
+        if refresh_job:
+            get_scheduler().refresh(refresh_job)
+        st.session_state[message_key] = (f"已保存 {result['rows']} 行，{result['batches']} 条语句，"
+                                         f"耗时 {result['elapsed'] * 1000:.0f} ms")
+        st.rerun()
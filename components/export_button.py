@@ -0,0 +1,32 @@
+import streamlit as st
+
+from lib.export import EXPORT_FORMATS, export_filename, export_mime, export_query
+
+
+def export_button(db, name, query, params=None, key="export"):
+    """
+    导出按钮组件
+
+    选择格式后点击下载，数据在点击时才通过服务端游标分批生成，页面渲染时不查询。
+
+    Args:
+        db: 数据库管理器
+        name: 导出文件名前缀
+        query: 导出使用的 SQL，应包含页面当前的筛选条件
+        params: 查询参数
+        key: 组件 key 前缀，同一页面多个导出按钮时需不同
+    """
+    col1, col2, col3 = st.columns([2, 1, 2])
+    with col1:
+        fmt = st.selectbox("导出格式", list(EXPORT_FORMATS), format_func=str.upper, key=f"{key}_format")
+    with col2:
+        compress = st.checkbox("gzip 压缩", key=f"{key}_gzip")
+    with col3:
+        st.download_button(
+            "⬇️导出",
+            data=lambda: export_query(db, query, params, fmt, compress),
+            file_name=export_filename(name, fmt, compress),
+            mime=export_mime(fmt, compress),
+            on_click="ignore",
+            key=f"{key}_download",
+        )
@@ -1,6 +1,6 @@
 from typing import Optional, Dict
 import streamlit as st
-from lib import get_db
+from lib import get_db, get_session_store
 
 def login_form():
     """登录表单组件"""
@@ -14,17 +14,20 @@ def login_form():
         if submitted:
             if not username or not password:
                 st.error("⚠️请输入用户名和密码")
-            elif verify_user(username, password):
-                st.session_state.logged_in = True
-                st.session_state.username = username
-                st.session_state.user_info = get_admin_info(username=username)
-                st.success("✅登录成功!")
-
-                # 设置查询参数以保持登录状态
-                st.query_params.token=username
-                st.rerun()
             else:
-                st.error("⚠️用户名或密码错误")
+                # 一次查询同时完成校验和取管理员信息
+                user_info = verify_user(username, password)
+                if user_info:
+                    st.session_state.logged_in = True
+                    st.session_state.username = username
+                    st.session_state.user_info = user_info
+                    st.success("✅登录成功!")
+
+                    # 签发会话令牌，刷新页面后凭令牌恢复登录状态
+                    st.query_params.token = get_session_store().issue(user_info)
+                    st.rerun()
+                else:
+                    st.error("⚠️用户名或密码错误")
 
     # 添加一些样式
     st.markdown("""
@@ -55,47 +58,43 @@ def init_session_state():
         st.session_state.current_page = st.query_params.page
 
     # 检查 URL 查询参数中的登录状态
+    # 令牌由会话存储解析，不访问 admins 表
     if st.query_params.get('token') and not st.session_state.logged_in:
-        token = st.query_params.token
-        # 这里应该验证 token 的有效性
-        st.session_state.logged_in = True
-        st.session_state.username = token  # 或者从 token 中解码出用户名
-        st.session_state.user_info = get_admin_info(username=token)
+        user_info = get_session_store().resolve(st.query_params.token)
+        if user_info:
+            st.session_state.logged_in = True
+            st.session_state.username = user_info['username']
+            st.session_state.user_info = user_info
+        else:
+            del st.query_params.token
 
 
 def is_logged_in() -> bool:
     """检查用户是否已登录"""
     return st.session_state.get('logged_in', False)
 
-def verify_user(username: str, password: str) -> bool:
-    """验证用户凭据"""
-    try:
-        db = get_db()
-        user = db.get_one("admins", "username = %s", (username,))
-        if user:
-            # 在实际应用中，这里应该使用密码哈希验证
-            stored_password = user['password']
-            return password == stored_password
-        return False
-    except Exception as e:
-        print(e)
-        return False
+def verify_user(username: str, password: str) -> Optional[Dict]:
+    """
+    验证用户凭据
 
-def get_admin_info(username: str) -> Optional[Dict]:
-    """获取用户信息"""
+    Returns:
+        验证通过时返回去掉密码字段的管理员信息，否则返回 None
+    """
     try:
         db = get_db()
-        return db.get_one(
-            "admins",
-            "username = %s",
-            username
-        )
+        user = db.get_one("admins", "username = %s", (username,))
+        # 在实际应用中，这里应该使用密码哈希验证
+        if user and password == user['password']:
+            user.pop('password')
+            return user
+        return None
     except Exception as e:
         print(e)
         return None
 
 def logout():
     """退出登录"""
+    get_session_store().revoke(st.query_params.get('token'))
     st.session_state.logged_in = False
     st.session_state.username = None
     st.session_state.user_info = None
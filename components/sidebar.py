@@ -15,7 +15,9 @@ def show_sidebar():
             "dashboard": "🏠仪表板",
             "user_manage": "👤用户管理",
             "task_data": "📊任务管理",
+            "movies": "🎬电影数据",
             "settings": "⚙️系统设置",
+            "diagnostics": "🩺性能诊断",
             "logout": "🚪退出登录"
         }
 
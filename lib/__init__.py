@@ -1,8 +1,42 @@
-
-from lib.db_manager import DatabaseManager, get_db
+from lib.db_manager import (ConnectionPool, DatabaseManager, PoolTimeoutError, QueryCache, QueryCancelledError,
+                            QueryTimeoutError, QueryWatchdog, StatementCache, get_db)
+from lib.datasets import DatasetCache, get_datasets
+from lib.metrics import DashboardMetrics, get_metrics
+from lib.migrations import Migration, Migrator, QueryPlanError, check_hot_queries, get_migrator
+from lib.query_stats import QueryStats
+from lib.rollups import ActivityRollup, get_rollup
+from lib.scheduler import RefreshScheduler, get_scheduler
+from lib.session_store import SessionStore, get_session_store
+from lib.table_mirror import TableMirror, get_mirror
+from lib.task_assignment import TaskAssigner
 
 __all__ = [
+    'ActivityRollup',
+    'ConnectionPool',
+    'DashboardMetrics',
     'DatabaseManager',
-    'get_db'
+    'DatasetCache',
+    'Migration',
+    'Migrator',
+    'PoolTimeoutError',
+    'QueryCache',
+    'QueryCancelledError',
+    'QueryPlanError',
+    'QueryStats',
+    'QueryTimeoutError',
+    'QueryWatchdog',
+    'RefreshScheduler',
+    'SessionStore',
+    'StatementCache',
+    'TableMirror',
+    'TaskAssigner',
+    'check_hot_queries',
+    'get_datasets',
+    'get_db',
+    'get_metrics',
+    'get_migrator',
+    'get_mirror',
+    'get_rollup',
+    'get_scheduler',
+    'get_session_store'
 ]
-
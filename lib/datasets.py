@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import streamlit as st
+
+# 仓库自带的 CSV 数据集目录
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+# 列式缓存格式的版本，转换逻辑变化时递增使旧缓存失效
+CACHE_VERSION = 1
+
+
+class DatasetCache:
+    """CSV 数据集的列式磁盘缓存：首次转换为 Arrow IPC 文件，之后内存映射加载"""
+
+    def __init__(self, data_dir: Path = DATA_DIR, cache_dir: Optional[Path] = None):
+        """
+        初始化数据集缓存
+
+        Args:
+            data_dir: CSV 文件所在目录
+            cache_dir: 列式缓存目录，默认为 data_dir 下的 .cache
+        """
+        self.data_dir = Path(data_dir)
+        self.cache_dir = Path(cache_dir) if cache_dir else self.data_dir / ".cache"
+        self._lock = threading.Lock()
+        # 数据集名 -> ((mtime_ns, size), 内存映射的 Arrow 表)
+        self._tables: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self.stats = {'csv_conversions': 0, 'mmap_loads': 0, 'memory_hits': 0, 'hash_checks': 0,
+                      'last_load_s': 0.0}
+
+    def source_path(self, name: str) -> Path:
+        """数据集对应的 CSV 路径"""
+        return self.data_dir / f"{name}.csv"
+
+    def _cache_paths(self, name: str) -> Tuple[Path, Path]:
+        """数据集的 Arrow 文件和元数据文件路径"""
+        return self.cache_dir / f"{name}.arrow", self.cache_dir / f"{name}.json"
+
+    @staticmethod
+    def _signature(path: Path) -> Tuple[int, int]:
+        """源文件的 (mtime_ns, size)，用于快速判断是否变化"""
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _file_hash(path: Path) -> str:
+        """源文件内容的 SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _write_atomic(path: Path, write) -> None:
+        """先写临时文件再替换，其他进程不会读到写了一半的文件"""
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def _convert(self, name: str, source: Path, signature: Tuple[int, int]) -> None:
+        """解析 CSV 并写出不压缩的 Arrow IPC 文件（不压缩才能零拷贝映射）"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.csv as pv
+
+        table = pv.read_csv(source)
+        # 去掉字符串两端的空白，例如电影名末尾的不间断空格
+        columns = [pc.utf8_trim_whitespace(column) if pa.types.is_string(column.type) else column
+                   for column in table.columns]
+        table = pa.table(columns, names=table.column_names)
+
+        arrow_path, meta_path = self._cache_paths(name)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        def write_arrow(path: Path) -> None:
+            with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        self._write_atomic(arrow_path, write_arrow)
+        self._write_meta(meta_path, signature, self._file_hash(source), table.num_rows)
+        self.stats['csv_conversions'] += 1
+
+    def _write_meta(self, meta_path: Path, signature: Tuple[int, int], sha256: str, rows: int) -> None:
+        """写出缓存对应的源文件签名"""
+        meta = {'version': CACHE_VERSION, 'mtime_ns': signature[0], 'size': signature[1],
+                'sha256': sha256, 'rows': rows}
+        self._write_atomic(meta_path, lambda path: path.write_text(json.dumps(meta)))
+
+    def _cache_valid(self, name: str, source: Path, signature: Tuple[int, int]) -> bool:
+        """
+        判断磁盘缓存是否对应当前源文件
+
+        mtime 和大小都未变时直接认为有效；只有 mtime 变化时再比较内容哈希，
+        内容相同则更新元数据后继续使用。
+        """
+        arrow_path, meta_path = self._cache_paths(name)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return False
+        if meta.get('version') != CACHE_VERSION or not arrow_path.exists():
+            return False
+        if (meta.get('mtime_ns'), meta.get('size')) == signature:
+            return True
+        if meta.get('size') != signature[1]:
+            return False
+        self.stats['hash_checks'] += 1
+        if self._file_hash(source) != meta.get('sha256'):
+            return False
+        self._write_meta(meta_path, signature, meta['sha256'], meta.get('rows', 0))
+        return True
+
+    def load(self, name: str):
+        """
+        加载数据集
+
+        进程内已加载且源文件未变时直接返回；否则内存映射磁盘缓存，缓存缺失或
+        失效时才解析一次 CSV。
+
+        Args:
+            name: 数据集名，即 data 目录下不带扩展名的 CSV 文件名
+
+        Returns:
+            pyarrow.Table，数据位于内存映射的文件中
+        """
+        import pyarrow as pa
+
+        source = self.source_path(name)
+        signature = self._signature(source)
+        with self._lock:
+            cached = self._tables.get(name)
+            if cached is not None and cached[0] == signature:
+                self.stats['memory_hits'] += 1
+                return cached[1]
+
+            start = time.perf_counter()
+            if not self._cache_valid(name, source, signature):
+                self._convert(name, source, signature)
+            arrow_path, _ = self._cache_paths(name)
+            table = pa.ipc.open_file(pa.memory_map(str(arrow_path), 'r')).read_all()
+            self.stats['mmap_loads'] += 1
+            self.stats['last_load_s'] = time.perf_counter() - start
+            self._tables[name] = (signature, table)
+            return table
+
+    def signature(self, name: str) -> Tuple[int, int]:
+        """数据集当前已加载版本的源文件签名，可作为派生结果的缓存键"""
+        self.load(name)
+        return self._tables[name][0]
+
+
+@st.cache_resource
+def get_datasets():
+    """获取数据集缓存单例"""
+    return DatasetCache()
@@ -1,148 +1,1715 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
 import pymysql
 from pymysql import Error, cursors
-from typing import Any, List, Dict, Optional, Tuple, Union
+from pymysql.constants import FIELD_TYPE
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 import streamlit as st
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from lib.query_stats import QueryStats, current_page, estimate_bytes, set_page
+
+
+class PoolTimeoutError(Error):
+    """等待连接池空闲连接超时"""
+
+
+class QueryTimeoutError(Error):
+    """查询超过了执行时间上限，已在服务端终止"""
+
+
+class QueryCancelledError(Error):
+    """发起查询的脚本运行已被新的运行取代，查询已在服务端终止"""
+
+
+# 维护计数的存储表，每个 (表, 谓词) 一行
+COUNTER_TABLE = "table_counts"
+
+COUNTER_TABLE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {COUNTER_TABLE} (
+    table_name VARCHAR(64) NOT NULL,
+    predicate VARCHAR(255) NOT NULL,
+    row_count BIGINT NOT NULL,
+    stale TINYINT(1) NOT NULL DEFAULT 0,
+    counted_at DATETIME NOT NULL,
+    PRIMARY KEY (table_name, predicate)
+)
+"""
+
+# count() 支持的模式
+COUNT_MODES = ('exact', 'estimate', 'maintained')
+
+# 可以用维护计数回答的条件：整表，或 "字段 = %s"、"字段 = 字面量" 形式的等值条件
+_EQUALITY_PATTERN = re.compile(r"^\s*`?(\w+)`?\s*=\s*(%s|-?\d+|'[^']*')\s*$")
+_WHOLE_TABLE_CONDITIONS = {'', '1=1', '1 = 1'}
+
+
+class ConnectionPool:
+    """线程安全的有界 PyMySQL 连接池"""
+
+    def __init__(self, config: Dict[str, Any], min_size: int = 1, max_size: int = 10,
+                 idle_timeout: float = 300, max_lifetime: float = 3600, wait_timeout: float = 30,
+                 ping_interval: float = 60):
+        """
+        初始化连接池
+
+        Args:
+            config: 传给 pymysql.connect 的连接参数
+            min_size: 保持的最少连接数
+            max_size: 允许同时存在的最多连接数
+            idle_timeout: 空闲连接超过该秒数后被回收（不低于 min_size）
+            max_lifetime: 连接存活超过该秒数后在归还时重建
+            wait_timeout: 连接耗尽时借出等待的最长秒数
+            ping_interval: 空闲超过该秒数的连接在借出前先 ping 检查，0 表示每次都检查
+        """
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"连接池大小配置无效: min_size={min_size}, max_size={max_size}")
+
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.wait_timeout = wait_timeout
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Condition()
+        # 空闲连接栈: (connection, created_at, last_used)，后进先出以便冷连接自然过期
+        self._idle: List[Tuple[Any, float, float]] = []
+        # 已借出连接 id -> created_at
+        self._in_use: Dict[int, float] = {}
+        self._opening = 0
+        self._closed = False
+
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'evicted_idle': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'peak_in_use': 0,
+            'pings': 0,
+            'reconnects': 0,
+        }
+
+        with self._lock:
+            for _ in range(min_size):
+                now = time.monotonic()
+                self._idle.append((self._new_connection(), now, now))
+
+    def _new_connection(self):
+        """创建一个新的底层连接"""
+        connection = pymysql.connect(**self.config)
+        self._stats['created'] += 1
+        return connection
+
+    @staticmethod
+    def _close_quietly(connection) -> None:
+        """关闭连接并忽略错误"""
+        try:
+            if connection.open:
+                connection.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, now: float) -> None:
+        """回收超时或超龄的空闲连接（调用方需持有锁）"""
+        keep = []
+        surplus = len(self._idle) + len(self._in_use) - self.min_size
+        # 栈底是最久未用的连接，从栈底开始回收
+        for connection, created_at, last_used in self._idle:
+            expired = now - created_at >= self.max_lifetime
+            idle_too_long = surplus > 0 and now - last_used >= self.idle_timeout
+            if expired or idle_too_long:
+                self._close_quietly(connection)
+                surplus -= 1
+                self._stats['recycled' if expired else 'evicted_idle'] += 1
+            else:
+                keep.append((connection, created_at, last_used))
+        self._idle = keep
+
+    def _size(self) -> int:
+        """当前连接总数，包括正在建立中的连接（调用方需持有锁）"""
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    @property
+    def in_use(self) -> int:
+        """当前借出的连接数"""
+        with self._lock:
+            return len(self._in_use)
+
+    def _checkout(self, connection, created_at: float, start: float, waited: bool) -> None:
+        """登记借出的连接并更新计数（调用方需持有锁）"""
+        self._in_use[id(connection)] = created_at
+        self._stats['checkouts'] += 1
+        self._stats['peak_in_use'] = max(self._stats['peak_in_use'], len(self._in_use))
+        if waited:
+            elapsed = time.monotonic() - start
+            self._stats['waits'] += 1
+            self._stats['wait_time_total'] += elapsed
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], elapsed)
+
+    def acquire(self):
+        """
+        借出一个连接，必要时新建或等待
+
+        Returns:
+            可用的 PyMySQL 连接
+        """
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        waited = False
+        connection = None
+        needs_ping = False
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("连接池已关闭")
+
+                now = time.monotonic()
+                self._evict_idle(now)
+
+                if self._idle:
+                    connection, created_at, last_used = self._idle.pop()
+                    needs_ping = now - last_used >= self.ping_interval
+                    self._checkout(connection, created_at, start, waited)
+                    break
+
+                if self._size() < self.max_size:
+                    # 先占位，在锁外建连，避免阻塞其他线程
+                    self._opening += 1
+                    break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"等待数据库连接超时 ({self.wait_timeout}s)，已借出 {len(self._in_use)} 个连接"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+
+        if connection is None:
+            try:
+                connection = pymysql.connect(**self.config)
+            except Exception:
+                with self._lock:
+                    self._opening -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._opening -= 1
+                self._stats['created'] += 1
+                self._checkout(connection, time.monotonic(), start, waited)
+            return connection
+
+        # 只对空闲较久的连接做存活检查，近期用过的连接出错时由调用方重试
+        if needs_ping:
+            try:
+                self._ensure_alive(connection)
+            except Error:
+                self.release(connection, discard=True)
+                raise
+
+        return connection
+
+    def _ensure_alive(self, connection) -> None:
+        """ping 连接，失败时重连一次"""
+        with self._lock:
+            self._stats['pings'] += 1
+        try:
+            connection.ping(reconnect=False)
+        except Error:
+            connection.connect()
+            with self._lock:
+                self._stats['reconnects'] += 1
+
+    def release(self, connection, discard: bool = False) -> None:
+        """
+        归还连接
+
+        Args:
+            connection: acquire 返回的连接
+            discard: 是否直接丢弃（例如连接已损坏）
+        """
+        with self._lock:
+            created_at = self._in_use.pop(id(connection), None)
+            now = time.monotonic()
+            if created_at is None:
+                # 不属于本池的连接，直接关闭
+                self._close_quietly(connection)
+            elif discard or self._closed or not connection.open:
+                self._close_quietly(connection)
+                self._stats['discarded'] += 1
+            elif now - created_at >= self.max_lifetime:
+                self._close_quietly(connection)
+                self._stats['recycled'] += 1
+            else:
+                self._idle.append((connection, created_at, now))
+            self._lock.notify()
+
+    def close(self) -> None:
+        """关闭所有空闲连接，借出中的连接在归还时关闭"""
+        with self._lock:
+            self._closed = True
+            for connection, _, _ in self._idle:
+                self._close_quietly(connection)
+            self._idle = []
+            self._lock.notify_all()
+
+    def reset(self) -> None:
+        """丢弃所有空闲连接并重新开放连接池"""
+        with self._lock:
+            for connection, _, _ in self._idle:
+                self._close_quietly(connection)
+            self._idle = []
+            self._closed = False
+            self._lock.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        Returns:
+            包含占用数、空闲数及等待时间等计数的字典
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_use'] = len(self._in_use)
+            stats['idle'] = len(self._idle)
+            stats['size'] = stats['in_use'] + stats['idle']
+            stats['max_size'] = self.max_size
+            stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+            return stats
+
+
+# MySQL 字段类型到 NumPy dtype 的映射，未列出的类型按 object 处理
+_FIELD_DTYPES = {
+    FIELD_TYPE.TINY: 'int64',
+    FIELD_TYPE.SHORT: 'int64',
+    FIELD_TYPE.LONG: 'int64',
+    FIELD_TYPE.INT24: 'int64',
+    FIELD_TYPE.LONGLONG: 'int64',
+    FIELD_TYPE.YEAR: 'int64',
+    FIELD_TYPE.FLOAT: 'float64',
+    FIELD_TYPE.DOUBLE: 'float64',
+    FIELD_TYPE.DECIMAL: 'float64',
+    FIELD_TYPE.NEWDECIMAL: 'float64',
+    # 微秒精度与 MySQL 一致；纳秒精度只能表示 1677-2262 年，9999-12-31 这类哨兵日期会静默溢出
+    FIELD_TYPE.DATE: 'datetime64[us]',
+    FIELD_TYPE.DATETIME: 'datetime64[us]',
+    FIELD_TYPE.TIMESTAMP: 'datetime64[us]',
+}
+
+
+def _to_array(values: Tuple, type_code: int) -> np.ndarray:
+    """
+    按字段类型把一列值转换为 NumPy 数组
+
+    整数列含 NULL 时退化为 float64（NULL 为 NaN），日期列的 NULL 为 NaT；
+    超出 int64 的 BIGINT UNSIGNED 值保留为 object，不丢精度。
+    MySQL 的零日期（0000-00-00）无法表示为日期，PyMySQL 以字符串返回，转换为 NaT。
+    """
+    dtype = _FIELD_DTYPES.get(type_code, 'object')
+    if dtype == 'object':
+        return np.array(values, dtype=object)
+    try:
+        return np.array(values, dtype=dtype)
+    except OverflowError:
+        return np.array(values, dtype=object)
+    except (TypeError, ValueError):
+        if dtype.startswith('datetime64'):
+            return np.array([v if isinstance(v, date) else None for v in values], dtype=dtype)
+        return np.array([np.nan if v is None else v for v in values], dtype='float64')
+
+
+# 表示连接已断开的客户端错误码：服务端已断开、查询中丢失连接、服务端丢失
+_DISCONNECT_ERRORS = {2006, 2013, 2055}
+
+
+def _is_disconnect(error: Exception) -> bool:
+    """判断异常是否由连接断开引起"""
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    return isinstance(error, pymysql.err.OperationalError) and bool(error.args) \
+        and error.args[0] in _DISCONNECT_ERRORS
+
+
+# 语句被 KILL QUERY 中断、超过 MAX_EXECUTION_TIME；连接本身仍然可用
+_INTERRUPTED_ERRORS = {1317, 3024}
+
+
+def _is_interrupted(error: Exception) -> bool:
+    """判断异常是否由语句被中断引起"""
+    return isinstance(error, pymysql.err.OperationalError) and bool(error.args) \
+        and error.args[0] in _INTERRUPTED_ERRORS
+
+
+_SELECT_PREFIX = re.compile(r'^\s*select\b(?!\s*/\*\+)', re.IGNORECASE)
+
+
+def with_timeout_hint(query: str, timeout: float) -> Tuple[str, bool]:
+    """
+    为 SELECT 语句加上 MAX_EXECUTION_TIME 优化器提示
+
+    Args:
+        query: SQL语句
+        timeout: 超时秒数
+
+    Returns:
+        (改写后的语句, 是否加上了提示)；非 SELECT 或已有提示的语句原样返回
+    """
+    milliseconds = max(1, int(timeout * 1000))
+    hinted, count = _SELECT_PREFIX.subn(lambda m: f"{m.group(0)} /*+ MAX_EXECUTION_TIME({milliseconds}) */",
+                                        query, count=1)
+    return hinted, bool(count)
+
+
+_run_owner = threading.local()
+# 表示未显式设置，按当前线程的 Streamlit 脚本运行推断
+_INHERIT = object()
+
+
+def current_owner():
+    """
+    获取当前线程上查询所属的脚本运行
+
+    Returns:
+        Streamlit 的 ScriptRequests 对象；不在脚本线程中或处于 query_owner(None) 块内时为 None
+    """
+    owner = getattr(_run_owner, 'value', _INHERIT)
+    if owner is not _INHERIT:
+        return owner
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return getattr(ctx, 'script_requests', None) if ctx is not None else None
+
+
+@contextmanager
+def query_owner(owner):
+    """
+    在块内显式指定当前线程上查询所属的脚本运行，退出时恢复
+
+    后台线程代某次运行执行查询时传入该运行的 current_owner()；共享的后台任务
+    传入 None，使其查询不会因某个会话的重新运行而被取消。
+    """
+    previous = getattr(_run_owner, 'value', _INHERIT)
+    _run_owner.value = owner
+    try:
+        yield
+    finally:
+        _run_owner.value = previous
+
+
+def _superseded(owner) -> bool:
+    """
+    脚本运行是否已收到重新运行或停止的请求
+
+    ScriptRequests 没有公开的只读状态，只能读取其 _state；该属性缺失或取值不是已知的
+    请求类型时（其他 Streamlit 版本）视为未被取代，查询仍按超时终止，只是不再提前取消。
+    """
+    state = getattr(owner, '_state', None)
+    name = getattr(state, 'name', state)
+    return name in ('RERUN', 'STOP')
+
+
+class QueryWatchdog:
+    """在旁路连接上对超时或已被取代的查询执行 KILL QUERY"""
+
+    def __init__(self, poll_interval: float = 0.2):
+        """
+        初始化看门狗，后台线程在第一次 watch 时启动
+
+        Args:
+            poll_interval: 检查正在执行的查询的间隔秒数
+        """
+        self.poll_interval = poll_interval
+        self._lock = threading.Condition()
+        # 登记号 -> [连接配置, 连接线程ID, 截止时间或 None, 所属运行, 终止原因, 是否正在执行 KILL]
+        self._watched: Dict[int, list] = {}
+        self._next_id = 0
+        # (host, port) -> 旁路连接，线程ID只在各自的服务器上有意义
+        self._sides: Dict[Tuple[Any, Any], Any] = {}
+        self._thread = None
+        self._stats = {'query_timeouts': 0, 'cancelled': 0, 'kill_failures': 0}
+
+    def watch(self, config: Dict[str, Any], thread_id: int, deadline: Optional[float], owner) -> int:
+        """
+        登记一条正在执行的查询
+
+        Args:
+            config: 执行查询的连接所用的配置，用于在同一服务器上建立旁路连接
+            thread_id: 执行查询的连接在服务端的线程ID
+            deadline: time.monotonic() 截止时间，为 None 时不由看门狗限时
+            owner: 所属脚本运行，为 None 时不会因重新运行被取消
+
+        Returns:
+            登记号，供 unwatch 使用
+        """
+        with self._lock:
+            self._next_id += 1
+            self._watched[self._next_id] = [config, thread_id, deadline, owner, None, False]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="query-watchdog", daemon=True)
+                self._thread.start()
+            self._lock.notify_all()
+            return self._next_id
+
+    def unwatch(self, token: int) -> Optional[str]:
+        """
+        取消登记
+
+        针对该连接的 KILL QUERY 正在执行时等待其结束，取消登记之后不会再有针对该连接的终止，
+        连接可以安全地归还连接池。
+
+        Returns:
+            查询被终止的原因 'timeout' 或 'superseded'，未被终止时为 None
+        """
+        with self._lock:
+            while token in self._watched and self._watched[token][5]:
+                self._lock.wait()
+            entry = self._watched.pop(token, None)
+        return entry[4] if entry else None
+
+    def _kill(self, config: Dict[str, Any], thread_id: int) -> bool:
+        """
+        在同一服务器的旁路连接上终止指定连接当前的语句（只在看门狗线程中调用，不持有锁）
+
+        Returns:
+            是否执行成功
+        """
+        server = (config.get('host'), config.get('port'))
+        for attempt in range(2):
+            side = self._sides.get(server)
+            try:
+                if side is None or not side.open:
+                    side = pymysql.connect(**{**config, 'cursorclass': cursors.Cursor, 'autocommit': True})
+                    self._sides[server] = side
+                with side.cursor() as cursor:
+                    cursor.execute(f"KILL QUERY {int(thread_id)}")
+                return True
+            except Error:
+                if side is not None:
+                    ConnectionPool._close_quietly(side)
+                self._sides.pop(server, None)
+        return False
+
+    def _loop(self) -> None:
+        """
+        看门狗线程：终止超时或所属运行已被取代的查询
+
+        持锁时只挑选要终止的查询并标记为正在执行 KILL，建立旁路连接和 KILL QUERY 在锁外进行，
+        服务器无响应时不会阻塞 watch/unwatch。
+        """
+        while True:
+            with self._lock:
+                while not self._watched:
+                    self._lock.wait()
+                now = time.monotonic()
+                victims = []
+                for entry in self._watched.values():
+                    config, thread_id, deadline, owner, reason, _ = entry
+                    if reason is not None:
+                        continue
+                    if owner is not None and _superseded(owner):
+                        reason = 'superseded'
+                    elif deadline is not None and now >= deadline:
+                        reason = 'timeout'
+                    else:
+                        continue
+                    entry[4] = reason
+                    entry[5] = True
+                    self._stats['cancelled' if reason == 'superseded' else 'query_timeouts'] += 1
+                    victims.append(entry)
+
+            failures = sum(not self._kill(entry[0], entry[1]) for entry in victims)
+
+            with self._lock:
+                for entry in victims:
+                    entry[5] = False
+                self._stats['kill_failures'] += failures
+                if victims:
+                    self._lock.notify_all()
+                self._lock.wait(self.poll_interval)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取看门狗统计
+
+        Returns:
+            包含 watched, query_timeouts, cancelled, kill_failures 的字典
+        """
+        with self._lock:
+            return {'watched': len(self._watched), **self._stats}
+
+
+_TABLE_PATTERN = re.compile(r'\b(?:from|join|into|update|table)\s+`?(\w+)`?', re.IGNORECASE)
+
+
+def normalize_sql(query: str) -> str:
+    """折叠 SQL 中的空白，作为缓存键和指纹使用"""
+    return ' '.join(query.split())
+
+
+def tables_in(query: str) -> Set[str]:
+    """
+    粗略提取 SQL 语句涉及的表名
+
+    Args:
+        query: SQL语句
+
+    Returns:
+        小写表名集合
+    """
+    return {name.lower() for name in _TABLE_PATTERN.findall(query)}
+
+
+class QueryCache:
+    """带 TTL 的 LRU 查询结果缓存，按表失效"""
+
+    def __init__(self, max_entries: int = 256, max_rows: int = 500000, default_ttl: float = 30):
+        """
+        初始化查询缓存
+
+        Args:
+            max_entries: 最多缓存的查询条数
+            max_rows: 所有缓存结果的总行数上限
+            default_ttl: 未指定 TTL 时的过期秒数
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.default_ttl = default_ttl
+
+        self._lock = threading.Lock()
+        # key -> (value, rows, expires_at, tables)
+        self._entries: 'OrderedDict[Tuple, Tuple[Any, int, float, Set[str]]]' = OrderedDict()
+        self._rows = 0
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def make_key(query: str, params: Optional[Tuple] = None) -> Tuple:
+        """由规范化 SQL 和参数构造缓存键"""
+        if params is not None and not isinstance(params, (tuple, list, dict)):
+            params = (params,)
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        elif params is not None:
+            params = tuple(params)
+        return normalize_sql(query), repr(params)
+
+    def _drop(self, key: Tuple) -> None:
+        """删除一条缓存（调用方需持有锁）"""
+        _, rows, _, _ = self._entries.pop(key)
+        self._rows -= rows
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Returns:
+            (是否命中, 缓存值)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._drop(key)
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, entry[0]
+
+    def set(self, key: Tuple, value: Any, ttl: Optional[float] = None, tables: Optional[Set[str]] = None,
+            rows: Optional[int] = None) -> None:
+        """
+        写入缓存，超出条数或行数上限时淘汰最久未用的条目
+
+        Args:
+            key: make_key 返回的缓存键
+            value: 查询结果
+            ttl: 过期秒数，默认 default_ttl
+            tables: 结果依赖的表，默认从 SQL 中提取
+            rows: 结果行数，用于容量控制，默认为列表长度
+        """
+        if rows is None:
+            rows = len(value) if isinstance(value, list) else 1
+        if rows > self.max_rows:
+            return
+        if tables is None:
+            tables = tables_in(key[0])
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, rows, expires_at, tables)
+            self._rows += rows
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate_tables(self, tables: Set[str]) -> int:
+        """
+        使涉及指定表的缓存失效
+
+        Args:
+            tables: 小写表名集合
+
+        Returns:
+            失效的条目数
+        """
+        if not tables:
+            return 0
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[3] & tables]
+            for key in stale:
+                self._drop(key)
+            self._stats['invalidations'] += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含命中、未命中、淘汰次数及当前大小的字典
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['rows'] = self._rows
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            return stats
+
+
+# 改变表结构的语句，执行后清空表结构和语句模板缓存
+_DDL_PATTERN = re.compile(r'^\s*(?:alter|create|drop|rename|truncate)\b', re.IGNORECASE)
+
+
+@lru_cache(maxsize=64)
+def _placeholders(count: int) -> str:
+    """count 个逗号分隔的 %s 占位符"""
+    return ', '.join(['%s'] * count)
+
+
+class StatementCache:
+    """CRUD 语句模板的 LRU 缓存，按 (操作, 表, 字段, 条件) 只编译一次"""
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        初始化语句模板缓存
+
+        Args:
+            max_entries: 最多缓存的模板数，条件字符串内联了字面量时键会很多
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._statements: OrderedDict = OrderedDict()
+        self._stats = {'hits': 0, 'compiles': 0, 'evictions': 0}
+
+    def get(self, key: Tuple) -> Optional[str]:
+        """读取已编译的模板，未缓存时返回 None"""
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is not None:
+                self._statements.move_to_end(key)
+                self._stats['hits'] += 1
+            return statement
+
+    def set(self, key: Tuple, statement: str) -> None:
+        """写入编译好的模板，超出容量时淘汰最久未用的"""
+        with self._lock:
+            self._statements[key] = statement
+            self._statements.move_to_end(key)
+            self._stats['compiles'] += 1
+            while len(self._statements) > self.max_entries:
+                self._statements.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self) -> None:
+        """清空全部模板（表结构变化后）"""
+        with self._lock:
+            self._statements.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """模板缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._statements)
+            lookups = stats['hits'] + stats['compiles']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            return stats
 
 
 class DatabaseManager:
     """简化版 PyMySQL 数据库操作类"""
 
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    # get_by_keys 行缓存的容量和过期秒数
+    ROW_CACHE_SIZE = 2048
+    ROW_CACHE_TTL = 300
+
+    # 维护计数行的缓存秒数（本进程写入时立即失效，其他进程的写入最多延迟这么久）
+    COUNT_CACHE_TTL = 5
+    # 估算计数的缓存秒数
+    ESTIMATE_CACHE_TTL = 60
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, pool_config: Optional[Dict[str, Any]] = None,
+                 cache_config: Optional[Dict[str, Any]] = None, stats_config: Optional[Dict[str, Any]] = None,
+                 replicas: Optional[List[Dict[str, Any]]] = None, routing_config: Optional[Dict[str, Any]] = None,
+                 counters: Optional[List[Dict[str, Any]]] = None):
+        """
+        初始化数据库连接池
+
+        Args:
+            config: 数据库配置字典，包含以下键:
+                - host: 数据库主机
+                - port: 数据库端口
+                - user: 用户名
+                - password: 密码
+                - database: 数据库名
+                - query_timeout: 可选，查询默认超时秒数
+            pool_config: 连接池配置，可包含 min_size, max_size, idle_timeout,
+                max_lifetime, wait_timeout；为空时读取 secrets 中的 [db.pool]
+            cache_config: 查询缓存配置，可包含 max_entries, max_rows, default_ttl；
+                为空时读取 secrets 中的 [db.cache]
+            stats_config: 查询统计配置，可包含 slow_threshold, max_samples, max_slow,
+                max_fingerprints；为空时读取 secrets 中的 [db.stats]
+            replicas: 只读副本的配置列表，未给出的键沿用主库配置；为空时读取
+                secrets 中的 [[db.replicas]]
+            routing_config: 读写路由配置，可包含 strategy（'round_robin' 或
+                'least_loaded'）、sticky_seconds、retry_interval；为空时读取 secrets 中的 [db.routing]
+            counters: 需要维护计数的表和谓词列表，每项包含 table，可选 column、value；
+                为空时读取 secrets 中的 [[db.counters]]，见 track_count
+        """
+        if config is None:
+            # 从 Streamlit secrets 获取配置
+            try:
+
+                self.config = {
+                    'host': st.secrets["db"]["host"],
+                    'port': st.secrets["db"]["port"],
+                    'user': st.secrets["db"]["user"],
+                    'password': st.secrets["db"]["password"],
+                    'database': st.secrets["db"]["database"],
+                    'charset': 'utf8mb4',
+                    'cursorclass': cursors.DictCursor,
+                    'autocommit': True,
+                    'query_timeout': st.secrets["db"].get("query_timeout")
+                }
+                if pool_config is None:
+                    pool_config = dict(st.secrets["db"].get("pool", {}))
+                if cache_config is None:
+                    cache_config = dict(st.secrets["db"].get("cache", {}))
+                if stats_config is None:
+                    stats_config = dict(st.secrets["db"].get("stats", {}))
+                if replicas is None:
+                    replicas = [dict(replica) for replica in st.secrets["db"].get("replicas", [])]
+                if routing_config is None:
+                    routing_config = dict(st.secrets["db"].get("routing", {}))
+                if counters is None:
+                    counters = [dict(counter) for counter in st.secrets["db"].get("counters", [])]
+            except KeyError as e:
+                st.error(f"缺少数据库配置: {e}")
+                raise
+        else:
+            self.config = config
+            self.config.setdefault('charset', 'utf8mb4')
+            self.config.setdefault('cursorclass', cursors.DictCursor)
+            # 单条语句由服务端自动提交，读操作无需额外的 COMMIT 往返
+            self.config.setdefault('autocommit', True)
+
+        # 不是连接参数，取出后再用配置建立连接
+        self.query_timeout = self.config.pop('query_timeout', None)
+        self.pool_config = pool_config or {}
+        self.pool = None
+        self.replica_configs = [{**self.config, **replica} for replica in replicas or []]
+        self.replica_pools: List[ConnectionPool] = []
+        routing_config = routing_config or {}
+        self.routing_strategy = routing_config.get('strategy', 'round_robin')
+        if self.routing_strategy not in ('round_robin', 'least_loaded'):
+            raise ValueError(f"未知的读路由策略: {self.routing_strategy}")
+        # 会话写入后该秒数内的读仍走主库，保证读到自己的写入
+        self.sticky_seconds = routing_config.get('sticky_seconds', 5)
+        # 副本借连接失败后暂停使用的秒数
+        self.retry_interval = routing_config.get('retry_interval', 30)
+        self._round_robin = 0
+        self._replica_down_until: List[float] = []
+        # 归属方（见 _session_key）-> 最近一次写入的 time.monotonic()
+        self._last_write: Dict[str, float] = {}
+        self._routing_stats = {'primary_reads': 0, 'replica_reads': 0, 'sticky_reads': 0, 'replica_failures': 0}
+        self.cache = QueryCache(**(cache_config or {}))
+        # 按主键缓存的宽字段详情行，供 get_by_keys 使用
+        self.row_cache = QueryCache(max_entries=self.ROW_CACHE_SIZE, max_rows=self.ROW_CACHE_SIZE,
+                                    default_ttl=self.ROW_CACHE_TTL)
+        self.query_stats = QueryStats(**(stats_config or {}))
+        # 每个线程当前借出的连接，保证同一线程内嵌套的 get_cursor 复用同一连接
+        self._local = threading.local()
+        self._max_allowed_packet = None
+        self._stats_lock = threading.Lock()
+        self._retried_queries = 0
+        self._executor = None
+        self.watchdog = QueryWatchdog()
+        # 小写表名 -> 需要维护计数的 {(字段, 值)}，(None, None) 表示整表行数
+        self._counters: Dict[str, Set[Tuple[Optional[str], Any]]] = {}
+        # 计数表是否存在，None 表示尚未检查；执行 DDL 后重新检查
+        self._counter_table_ready: Optional[bool] = None
+        # 表名 -> {字段: 默认值}，用于校验标识符和按默认值维护计数
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+        self.statements = StatementCache()
+        for counter in counters or []:
+            self.track_count(counter['table'], counter.get('column'), counter.get('value'))
+        self._connect()
+
+    @property
+    def connection(self):
+        """当前线程借出的连接，未借出时为 None"""
+        return getattr(self._local, 'connection', None)
+
+    def _connect(self) -> None:
+        """
+        建立数据库连接池
+
+        副本连接池不预先建立连接，首次读时才连接；副本不可达只会使其暂停使用、
+        读退回主库，不影响启动。
+        """
+        try:
+            self.pool = ConnectionPool(self.config, **self.pool_config)
+        except Error as e:
+            st.error(f"数据库连接失败: {e}")
+            raise
+        self.replica_pools = [ConnectionPool(config, **{**self.pool_config, 'min_size': 0})
+                              for config in self.replica_configs]
+        self._replica_down_until = [0.0] * len(self.replica_pools)
+
+    def reconnect(self) -> None:
+        """重新连接数据库"""
+        self.pool.reset()
+        for pool in self.replica_pools:
+            pool.reset()
+
+    def close(self) -> None:
+        """关闭数据库连接池"""
+        if self.pool:
+            self.pool.close()
+        for pool in self.replica_pools:
+            pool.close()
+
+    def is_connected(self) -> bool:
+        """检查数据库连接是否有效"""
+        try:
+            with self.connection_scope() as connection:
+                connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        return self.pool.stats()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """获取查询缓存统计信息"""
+        return self.cache.stats()
+
+    def invalidate(self, *tables: str) -> int:
+        """
+        使涉及指定表的缓存失效
+
+        Args:
+            tables: 表名
+
+        Returns:
+            失效的缓存条目数
+        """
+        return self._invalidate_caches({table.lower() for table in tables})
+
+    def _invalidate_caches(self, tables: Set[str]) -> int:
+        """使查询缓存和行缓存中涉及指定表的条目失效"""
+        return self.cache.invalidate_tables(tables) + self.row_cache.invalidate_tables(tables)
+
+    @contextmanager
+    def connection_scope(self, read_only: bool = False):
+        """
+        在当前线程借出一个连接的上下文管理器
+
+        同一线程内嵌套调用复用外层借出的连接，最外层退出时归还连接池。
+        只读且外层未持有连接时按路由策略借出副本连接；外层持有副本连接时，
+        内层的写操作另借主库连接。
+
+        Args:
+            read_only: 块内是否只有读操作
+        """
+        connection = self.connection
+        if connection is not None and (read_only or not getattr(self._local, 'on_replica', False)):
+            yield connection
+            return
+
+        outer = (connection, getattr(self._local, 'pool', None), getattr(self._local, 'on_replica', False))
+        pool, connection = self._acquire(read_only and connection is None)
+        self._local.connection = connection
+        self._local.pool = pool
+        self._local.on_replica = pool is not self.pool
+        discard = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # 连接级错误，连接可能已损坏，不再放回池中
+            discard = True
+            raise
+        finally:
+            self._local.connection, self._local.pool, self._local.on_replica = outer
+            pool.release(connection, discard=discard)
+
+    def _session_key(self) -> str:
+        """
+        读己之写的归属方
+
+        脚本线程为所在的 Streamlit 会话ID；后台线程按当前页面区分（调度器任务为
+        scheduler:<任务名>），没有页面时按线程区分，互不影响路由。
+        """
+        key = getattr(self._local, 'session_key', None)
+        if key is not None:
+            return key
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+        page = current_page()
+        return f"page:{page}" if page else f"thread:{threading.get_ident()}"
+
+    def _route(self) -> ConnectionPool:
+        """
+        为一次读操作选择连接池
+
+        当前归属方（见 _session_key）在 sticky_seconds 内写过数据时走主库。
+        其余读按 round_robin 或 least_loaded 在可用副本中选择，没有可用副本时走主库。
+        """
+        if not self.replica_pools:
+            return self.pool
+        now = time.monotonic()
+        with self._stats_lock:
+            last_write = self._last_write.get(self._session_key())
+            if last_write is not None and now - last_write < self.sticky_seconds:
+                self._routing_stats['sticky_reads'] += 1
+                self._routing_stats['primary_reads'] += 1
+                return self.pool
+            available = [i for i, until in enumerate(self._replica_down_until) if until <= now]
+            if not available:
+                self._routing_stats['primary_reads'] += 1
+                return self.pool
+            if self.routing_strategy == 'least_loaded':
+                index = min(available, key=lambda i: self.replica_pools[i].in_use)
+            else:
+                index = available[self._round_robin % len(available)]
+                self._round_robin += 1
+            self._routing_stats['replica_reads'] += 1
+            return self.replica_pools[index]
+
+    def _acquire(self, read_only: bool = False) -> Tuple[ConnectionPool, Any]:
+        """
+        借出连接，副本不可用时退回主库
+
+        Returns:
+            (连接所属的连接池, 连接)
+        """
+        pool = self._route() if read_only else self.pool
+        if pool is self.pool:
+            return pool, pool.acquire()
+        try:
+            return pool, pool.acquire()
+        except Error:
+            # 副本暂停使用一段时间，本次读改走主库
+            with self._stats_lock:
+                self._replica_down_until[self.replica_pools.index(pool)] = time.monotonic() + self.retry_interval
+                self._routing_stats['replica_failures'] += 1
+                self._routing_stats['replica_reads'] -= 1
+                self._routing_stats['primary_reads'] += 1
+            return self.pool, self.pool.acquire()
+
+    def _mark_written(self) -> None:
+        """记录当前归属方的最近写入时间，用于读己之写"""
+        now = time.monotonic()
+        with self._stats_lock:
+            self._last_write[self._session_key()] = now
+            if len(self._last_write) > 1000:
+                self._last_write = {key: at for key, at in self._last_write.items()
+                                    if now - at < self.sticky_seconds}
+
+    def routing_stats(self) -> Dict[str, Any]:
+        """
+        获取读写路由统计
+
+        Returns:
+            包含 replicas、strategy、primary_reads、replica_reads、sticky_reads、
+            replica_failures 及各副本连接池统计的字典
+        """
+        now = time.monotonic()
+        with self._stats_lock:
+            stats = {'replicas': len(self.replica_pools), 'strategy': self.routing_strategy, **self._routing_stats}
+            down = [until > now for until in self._replica_down_until]
+        stats['replica_pools'] = [
+            {'host': pool.config.get('host'), 'down': is_down, **pool.stats()}
+            for pool, is_down in zip(self.replica_pools, down)
+        ]
+        return stats
+
+    def in_transaction(self) -> bool:
+        """当前线程是否处于 transaction() 中"""
+        return getattr(self._local, 'tx_depth', 0) > 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        显式事务的上下文管理器
+
+        块内所有写操作共用一个连接，正常退出时一次提交，异常时回滚。
+        嵌套调用使用 SAVEPOINT，内层异常只回滚到内层开始处。
+        写操作引起的缓存失效推迟到最外层事务提交之后。
+
+        Yields:
+            当前 DatabaseManager
+        """
+        with self.connection_scope() as connection:
+            depth = getattr(self._local, 'tx_depth', 0)
+            savepoint = f"sp_{depth}"
+            try:
+                if depth == 0:
+                    self._local.pending_invalidations = set()
+                    connection.begin()
+                else:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"SAVEPOINT {savepoint}")
+            except Error as e:
+                st.error(f"开启事务失败: {e}")
+                raise
+
+            self._local.tx_depth = depth + 1
+            try:
+                yield self
+            except BaseException:
+                self._local.tx_depth = depth
+                if connection.open:
+                    if depth == 0:
+                        self._local.pending_invalidations = set()
+                        connection.rollback()
+                    else:
+                        with connection.cursor() as cursor:
+                            cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                raise
+
+            self._local.tx_depth = depth
+            try:
+                if depth == 0:
+                    connection.commit()
+                else:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            except Error as e:
+                if depth == 0 and connection.open:
+                    connection.rollback()
+                st.error(f"提交事务失败: {e}")
+                raise
+
+            if depth == 0:
+                pending, self._local.pending_invalidations = self._local.pending_invalidations, set()
+                if pending:
+                    self._mark_written()
+                self._invalidate_caches(pending)
+
+    def _written(self, *tables: str) -> None:
+        """记录写入的表：事务中推迟到提交后失效缓存，否则立即失效"""
+        names = {table.lower() for table in tables}
+        self._mark_written()
+        if self.in_transaction():
+            self._local.pending_invalidations |= names
+        else:
+            self._invalidate_caches(names)
+
+    @contextmanager
+    def get_cursor(self, cursor_class=None, read_only: bool = False):
+        """
+        获取数据库游标的上下文管理器
+
+        不在 transaction() 中时，语句由 autocommit 提交；若连接关闭了 autocommit
+        则在此处提交，出错时回滚。事务中的提交和回滚由 transaction() 负责。
+
+        Args:
+            cursor_class: 游标类型，默认使用配置中的 cursorclass
+            read_only: 是否只读，只读时可能借出副本连接
+        """
+        cursor = None
+        try:
+            with self.connection_scope(read_only) as connection:
+                managed = not self.in_transaction() and not connection.get_autocommit()
+                start = time.perf_counter()
+                try:
+                    cursor = connection.cursor(cursor_class)
+                    yield cursor
+                    if managed:
+                        connection.commit()
+                except Error:
+                    if managed and connection.open:
+                        connection.rollback()
+                    raise
+                finally:
+                    if cursor:
+                        self._record(cursor, time.perf_counter() - start)
+                        cursor.close()
+        except Error as e:
+            # 被取消的查询属于已被取代的运行，没有需要提示的页面
+            if not getattr(self._local, 'quiet', False) and not isinstance(e, QueryCancelledError):
+                st.error(f"数据库操作失败: {e}")
+            raise
+
+    @contextmanager
+    def _guard(self, pool: ConnectionPool, connection, query: str, timeout: Optional[float],
+               cancellable: bool = True):
+        """
+        为一条查询施加超时并登记到看门狗
+
+        SELECT 通过 MAX_EXECUTION_TIME 提示由服务端限时，其他语句到期时由看门狗
+        KILL QUERY；所属脚本运行被新的运行取代时，看门狗同样终止查询。
+
+        Args:
+            pool: 连接所属的连接池，看门狗在同一服务器上终止查询
+            connection: 执行查询的连接
+            query: SQL语句
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
+            cancellable: 所属脚本运行被取代时是否终止；写操作不取消，避免保存到一半被丢弃
+
+        Yields:
+            实际执行的 SQL 语句
+        """
+        if timeout is None:
+            timeout = self.query_timeout
+        deadline = None
+        if timeout:
+            query, hinted = with_timeout_hint(query, timeout)
+            if not hinted:
+                deadline = time.monotonic() + timeout
+        owner = current_owner() if cancellable else None
+        token = self.watchdog.watch(pool.config, connection.thread_id(), deadline, owner) \
+            if owner is not None or deadline is not None else None
+        reason = None
+        try:
+            yield query
+        except pymysql.err.OperationalError as e:
+            if token is not None:
+                reason = self.watchdog.unwatch(token)
+                token = None
+            # 只有语句被中断的错误才归因于看门狗或 MAX_EXECUTION_TIME，断线等错误原样抛出
+            if _is_interrupted(e):
+                if reason == 'superseded':
+                    raise QueryCancelledError(f"脚本已重新运行，查询已取消: {e}") from e
+                if reason == 'timeout' or e.args[0] == 3024:
+                    raise QueryTimeoutError(f"查询超过 {timeout} 秒，已终止") from e
+            raise
+        finally:
+            if token is not None:
+                self.watchdog.unwatch(token)
+
+    def _record(self, cursor, elapsed: float) -> None:
+        """把游标最后执行的语句计入查询统计"""
+        query = getattr(cursor, '_executed', None)
+        if not query:
+            return
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        self.query_stats.record(query, elapsed, cursor.rowcount, estimate_bytes(getattr(cursor, '_rows', None)))
+
+    def explain(self, query: str, params: Optional[Tuple] = None, primary: bool = False) -> List[Dict]:
+        """
+        获取查询的执行计划
+
+        Args:
+            query: SQL查询语句（可以是慢查询日志中已内联参数的语句）
+            params: 查询参数
+            primary: 是否固定在主库上执行（例如刚建完索引时）
+
+        Returns:
+            EXPLAIN 结果行
+        """
+        return self._read("EXPLAIN " + query, params, primary=primary)[1]
+
+    def describe(self, query: str, params: Optional[Tuple] = None) -> Tuple:
+        """
+        获取查询结果的字段描述，不读取任何行
+
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+
+        Returns:
+            游标描述，每个字段为 (name, type_code, ...)
+        """
+        return self._read(f"SELECT * FROM ({query}) AS described LIMIT 0", params)[0] or ()
+
+    def _read(self, query: str, params: Optional[Tuple] = None, fetch: str = 'all',
+              cursor_class=None, timeout: Optional[float] = None, primary: bool = False) -> Tuple[Tuple, Any]:
+        """
+        执行只读查询，连接断开时透明重试一次
+
+        只有不在事务、且当前线程未持有连接时才会重试，此时重试不会破坏任何状态。
+        当前线程未持有连接时，查询按路由策略发往副本。
+
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            fetch: 'all' 返回全部行，'one' 返回第一行
+            cursor_class: 游标类型
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
+            primary: 是否必须在主库上执行
+
+        Returns:
+            (游标描述, 查询结果)
+        """
+        attempts = 1 if self.connection is not None else 2
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            self._local.quiet = not last
+            try:
+                with self.get_cursor(cursor_class, read_only=not primary) as cursor, \
+                        self._guard(self._local.pool, cursor.connection, query, timeout) as guarded:
+                    cursor.execute(guarded, params)
+                    result = cursor.fetchone() if fetch == 'one' else cursor.fetchall()
+                    return cursor.description, result
+            except Error as e:
+                if last:
+                    raise
+                if not _is_disconnect(e):
+                    if not isinstance(e, QueryCancelledError):
+                        st.error(f"数据库操作失败: {e}")
+                    raise
+                with self._stats_lock:
+                    self._retried_queries += 1
+            finally:
+                self._local.quiet = False
+
+    def liveness_stats(self) -> Dict[str, int]:
+        """
+        获取连接存活检查相关计数
+
+        Returns:
+            包含 pings, reconnects, retried_queries 及看门狗 query_timeouts, cancelled 等计数的字典
+        """
+        pool_stats = self.pool.stats()
+        with self._stats_lock:
+            retried = self._retried_queries
+        return {'pings': pool_stats['pings'], 'reconnects': pool_stats['reconnects'], 'retried_queries': retried,
+                **self.watchdog.stats()}
+
+    def execute(self, query: str, params: Optional[Tuple] = None, cache_ttl: Optional[float] = None,
+                timeout: Optional[float] = None) -> List[Dict]:
         """
-        初始化数据库连接
+        执行查询语句并返回结果
 
         Args:
-            config: 数据库配置字典，包含以下键:
-                - host: 数据库主机
-                - port: 数据库端口
-                - user: 用户名
-                - password: 密码
-                - database: 数据库名
+            query: SQL查询语句
+            params: 查询参数
+            cache_ttl: 结果缓存秒数，为 None 时不使用缓存
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            查询结果列表（命中缓存时为缓存结果的浅拷贝）
         """
-        if config is None:
-            # 从 Streamlit secrets 获取配置
-            try:
+        if cache_ttl is not None:
+            key = self.cache.make_key(query, params)
+            hit, rows = self.cache.get(key)
+            if hit:
+                return list(rows)
 
-                self.config = {
-                    'host': st.secrets["db"]["host"],
-                    'port': st.secrets["db"]["port"],
-                    'user': st.secrets["db"]["user"],
-                    'password': st.secrets["db"]["password"],
-                    'database': st.secrets["db"]["database"],
-                    'charset': 'utf8mb4',
-                    'cursorclass': cursors.DictCursor
-                }
-            except KeyError as e:
-                st.error(f"缺少数据库配置: {e}")
-                raise
-        else:
-            self.config = config
-            self.config.setdefault('charset', 'utf8mb4')
-            self.config.setdefault('cursorclass', cursors.DictCursor)
+        _, rows = self._read(query, params, timeout=timeout)
 
-        self.connection = None
-        self._connect()
+        if cache_ttl is not None:
+            self.cache.set(key, rows, cache_ttl)
+            rows = list(rows)
+        return rows
 
-    def _connect(self) -> None:
-        """建立数据库连接"""
-        try:
-            self.connection = pymysql.connect(**self.config)
-        except Error as e:
-            st.error(f"数据库连接失败: {e}")
-            raise
+    def execute_columnar(self, query: str, params: Optional[Tuple] = None, cache_ttl: Optional[float] = None,
+                         timeout: Optional[float] = None, primary: bool = False) -> Dict[str, np.ndarray]:
+        """
+        执行查询并按列返回结果，不为每行创建字典
 
-    def reconnect(self) -> None:
-        """重新连接数据库"""
-        self.close()
-        self._connect()
+        使用元组游标读取，一次性转置为列，并按游标描述中的字段类型映射 dtype。
 
-    def close(self) -> None:
-        """关闭数据库连接"""
-        if self.connection and self.connection.open:
-            self.connection.close()
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            cache_ttl: 结果缓存秒数，为 None 时不使用缓存
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
+            primary: 是否必须在主库上执行
 
-    def is_connected(self) -> bool:
-        """检查数据库连接是否有效"""
-        try:
-            if self.connection and self.connection.open:
-                self.connection.ping(reconnect=True)
-                return True
-            return False
-        except Error:
-            return False
+        Returns:
+            有序的 {列名: NumPy 数组} 字典
+        """
+        if cache_ttl is not None:
+            key = self.cache.make_key('columnar:' + query, params)
+            hit, columns = self.cache.get(key)
+            if hit:
+                return dict(columns)
 
-    @contextmanager
-    def get_cursor(self):
-        """获取数据库游标的上下文管理器"""
+        description, rows = self._read(query, params, cursor_class=cursors.Cursor, timeout=timeout, primary=primary)
+        description = description or ()
+
+        values = list(zip(*rows)) if rows else [()] * len(description)
+        columns = {
+            field[0]: _to_array(column, field[1])
+            for field, column in zip(description, values)
+        }
+
+        if cache_ttl is not None:
+            self.cache.set(key, columns, cache_ttl, tables=tables_in(query), rows=len(rows))
+            columns = dict(columns)
+        return columns
+
+    def execute_df(self, query: str, params: Optional[Tuple] = None,
+                   cache_ttl: Optional[float] = None, timeout: Optional[float] = None) -> pd.DataFrame:
+        """
+        执行查询并返回 pandas DataFrame
+
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            cache_ttl: 结果缓存秒数，为 None 时不使用缓存
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            以列数组直接构建的 DataFrame
+        """
+        return pd.DataFrame(self.execute_columnar(query, params, cache_ttl, timeout), copy=False)
+
+    def execute_arrow(self, query: str, params: Optional[Tuple] = None, cache_ttl: Optional[float] = None,
+                      timeout: Optional[float] = None):
+        """
+        执行查询并返回 Arrow 表
+
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            cache_ttl: 结果缓存秒数，为 None 时不使用缓存
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            pyarrow.Table
+        """
+        import pyarrow as pa
+
+        columns = self.execute_columnar(query, params, cache_ttl, timeout)
+        return pa.table({name: pa.array(array, from_pandas=True) for name, array in columns.items()})
+
+    def _fanout_executor(self) -> ThreadPoolExecutor:
+        """并发查询使用的线程池，大小与连接池上限一致"""
+        with self._stats_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool.max_size, thread_name_prefix="db-fanout")
+            return self._executor
+
+    def execute_concurrent(self, queries: Dict[str, Union[str, Tuple[str, Optional[Tuple]]]], result: str = 'rows',
+                           cache_ttl: Optional[float] = None,
+                           timeout: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        并发执行多条互不依赖的查询，每条查询使用各自的连接
+
+        页面耗时由各查询之和变为其中最慢的一条。查询在其他线程执行，
+        因此不会看到调用方所在事务中尚未提交的修改。
+
+        Args:
+            queries: {名称: SQL} 或 {名称: (SQL, 参数)}
+            result: 结果形式，'rows'（字典列表）、'columnar'（列数组）或 'df'（DataFrame）
+            cache_ttl: 结果缓存秒数，为 None 时不使用缓存
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            ({名称: 查询结果}, {名称: 耗时秒数})；任一查询失败时在全部结束后抛出第一个异常
+        """
+        run = {'rows': self.execute, 'columnar': self.execute_columnar, 'df': self.execute_df}[result]
+        page = current_page()
+        owner = current_owner()
+        session = self._session_key()
+
+        def timed(query: str, params: Optional[Tuple]) -> Tuple[Any, float]:
+            # 沿用调用方页面和读己之写的归属方；调用方的运行被取代时一并取消
+            set_page(page)
+            self._local.session_key = session
+            start = time.perf_counter()
+            try:
+                with query_owner(owner):
+                    value = run(query, params, cache_ttl, timeout)
+            finally:
+                self._local.session_key = None
+            return value, time.perf_counter() - start
+
+        executor = self._fanout_executor()
+        futures = {}
+        for name, spec in queries.items():
+            query, params = (spec, None) if isinstance(spec, str) else spec
+            futures[name] = executor.submit(timed, query, params)
+
+        results: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        error = None
+        for name, future in futures.items():
+            try:
+                results[name], timings[name] = future.result()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return results, timings
+
+    def iter_rows(self, query: str, params: Optional[Tuple] = None, chunk_size: int = 1000,
+                  batches: bool = False, timeout: Optional[float] = None) -> Iterator[Union[Dict, List[Dict]]]:
+        """
+        使用服务端游标流式读取查询结果
+
+        结果不会一次性加载到内存。生成器独占一个连接，直到读完或被关闭；
+        提前停止迭代时该连接上仍有未读完的结果集，因此直接丢弃而不是放回连接池。
+
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            chunk_size: 每次从服务端读取的行数
+            batches: 为 True 时按批产出行列表，否则逐行产出
+            timeout: 超时秒数，从开始执行到读完全部结果计时；为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            逐行或逐批产出结果的生成器
+        """
+        pool, connection = self._acquire(read_only=True)
         cursor = None
+        exhausted = False
+        start = time.perf_counter()
+        total_rows = 0
+        total_bytes = 0
         try:
-            # 确保连接有效
-            if not self.is_connected():
-                self.reconnect()
-
-            cursor = self.connection.cursor()
-            yield cursor
-            self.connection.commit()
+            cursor = connection.cursor(cursors.SSDictCursor)
+            with self._guard(pool, connection, query, timeout) as guarded:
+                cursor.execute(guarded, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    total_rows += len(rows)
+                    total_bytes += estimate_bytes(rows)
+                    if batches:
+                        yield rows
+                    else:
+                        yield from rows
+            # 未开启 autocommit 时结束只读事务，避免连接带着旧快照回到连接池
+            if not connection.get_autocommit():
+                connection.commit()
+            exhausted = True
         except Error as e:
-            if self.connection:
-                self.connection.rollback()
-            st.error(f"数据库操作失败: {e}")
+            if not isinstance(e, QueryCancelledError):
+                st.error(f"数据库操作失败: {e}")
             raise
         finally:
-            if cursor:
+            self.query_stats.record(query, time.perf_counter() - start, total_rows, total_bytes)
+            if exhausted and cursor:
                 cursor.close()
+            pool.release(connection, discard=not exhausted)
 
-    def execute(self, query: str, params: Optional[Tuple] = None) -> List[Dict]:
+    def _execute_write(self, cursor, query: str, params: Optional[Tuple], timeout: Optional[float]) -> int:
         """
-        执行查询语句并返回结果
+        在游标上执行一条写语句
 
-        Args:
-            query: SQL查询语句
-            params: 查询参数
+        到期时由看门狗 KILL QUERY，语句回滚；不随所属脚本运行被取代而取消。
 
         Returns:
-            查询结果列表
+            受影响的行数
         """
-        with self.get_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        with self._guard(self._local.pool, cursor.connection, query, timeout, cancellable=False) as guarded:
+            return cursor.execute(guarded, params)
 
-    def execute_non_query(self, query: str, params: Optional[Tuple] = None) -> int:
+    def execute_non_query(self, query: str, params: Optional[Tuple] = None, timeout: Optional[float] = None) -> int:
         """
         执行非查询语句（INSERT, UPDATE, DELETE）
 
         Args:
             query: SQL语句
             params: 参数
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
 
         Returns:
             受影响的行数
         """
         with self.get_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.rowcount
+            rowcount = self._execute_write(cursor, query, params, timeout)
+
+        tables = tables_in(query)
+        self._written(*tables)
+        if _DDL_PATTERN.match(query):
+            self._schemas.clear()
+            self.statements.clear()
+            self._counter_table_ready = None
+        # 任意语句的影响无法推算，相关的维护计数改为下次读取时重新统计
+        self._mark_counts_stale(tables)
+        return rowcount
 
-    def insert(self, table: str, data: Dict) -> int:
+    def insert(self, table: str, data: Dict, timeout: Optional[float] = None) -> int:
         """
         插入单条数据
 
         Args:
             table: 表名
             data: 要插入的数据字典
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
 
         Returns:
             插入的行ID
         """
-        columns = ', '.join(data.keys())
-        placeholders = ', '.join(['%s'] * len(data))
-        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        query = self._compile('insert', table, tuple(data))
+        counters = self._tracked(table)
+        deltas = self._insert_deltas(table, [data], counters)
 
-        with self.get_cursor() as cursor:
-            cursor.execute(query, tuple(data.values()))
-            return cursor.lastrowid
+        # 维护计数与写入在同一事务中提交
+        with self.transaction() if counters else nullcontext():
+            with self.get_cursor() as cursor:
+                self._execute_write(cursor, query, tuple(data.values()), timeout)
+                lastrowid = cursor.lastrowid
+            self._adjust_counts(table, deltas)
+
+        self._written(table)
+        return lastrowid
+
+    def max_allowed_packet(self) -> int:
+        """
+        获取服务端 max_allowed_packet（首次查询后缓存）
+
+        Returns:
+            单个数据包允许的最大字节数
+        """
+        if self._max_allowed_packet is None:
+            result = self._read("SELECT @@max_allowed_packet AS max_allowed_packet", fetch='one', primary=True)[1]
+            self._max_allowed_packet = int(result['max_allowed_packet']) if result else 4 * 1024 * 1024
+        return self._max_allowed_packet
+
+    def _bulk_write(self, table: str, rows: List[Dict], batch_size: int, suffix: str = "",
+                    timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        以多行 VALUES 语句批量写入，每批一个事务
+
+        Args:
+            table: 表名
+            rows: 字段相同的数据字典列表
+            batch_size: 每批最多行数
+            suffix: 追加在 VALUES 之后的子句
+            timeout: 每条语句的超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            包含 rows, affected, batches, elapsed, rows_per_sec 的统计字典
+        """
+        start = time.perf_counter()
+        result = {'rows': 0, 'affected': 0, 'batches': 0, 'elapsed': 0.0, 'rows_per_sec': 0.0}
+        if not rows:
+            return result
+
+        columns = list(rows[0].keys())
+        head = self._compile('insert_head', table, tuple(columns))
+        # 为语句头尾和协议开销预留空间
+        packet_limit = self.max_allowed_packet() - len(head) - len(suffix) - 1024
+        # 冲突时更新的行原值未知，无法推算计数变化，只对纯插入逐批维护计数
+        counters = [] if suffix else self._tracked(table)
+
+        def flush(values: List[str], batch: List[Dict]) -> None:
+            deltas = self._insert_deltas(table, batch, counters)
+            with self.transaction() if counters else nullcontext():
+                with self.get_cursor() as cursor:
+                    result['affected'] += self._execute_write(cursor, head + ', '.join(values) + suffix, None, timeout)
+                self._adjust_counts(table, deltas)
+            result['batches'] += 1
+
+        values: List[str] = []
+        batch: List[Dict] = []
+        size = 0
+        with self.connection_scope() as connection:
+            for row in rows:
+                if list(row.keys()) != columns:
+                    raise ValueError(f"批量写入的行字段不一致: {list(row.keys())} != {columns}")
+                value = '(' + ', '.join(connection.literal(v) for v in row.values()) + ')'
+                value_size = len(value.encode('utf-8')) + 2
+                if values and (len(values) >= batch_size or size + value_size > packet_limit):
+                    flush(values, batch)
+                    values, batch, size = [], [], 0
+                values.append(value)
+                batch.append(row)
+                size += value_size
+                result['rows'] += 1
+            if values:
+                flush(values, batch)
+
+        self._written(table)
+        if suffix:
+            self._mark_counts_stale([table])
+        result['elapsed'] = time.perf_counter() - start
+        result['rows_per_sec'] = result['rows'] / result['elapsed'] if result['elapsed'] > 0 else 0.0
+        return result
+
+    def insert_many(self, table: str, rows: List[Dict], batch_size: int = 1000,
+                    timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        批量插入数据
+
+        按 batch_size 和 max_allowed_packet 切分为多行 INSERT，每批一个事务。
+
+        Args:
+            table: 表名
+            rows: 要插入的数据字典列表，所有字典的键须一致
+            batch_size: 每批最多行数
+            timeout: 每条语句的超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            包含 rows, affected, batches, elapsed, rows_per_sec 的统计字典
+        """
+        return self._bulk_write(table, rows, batch_size, timeout=timeout)
+
+    def upsert_many(self, table: str, rows: List[Dict], update_columns: Optional[List[str]] = None,
+                    batch_size: int = 1000, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        批量插入或更新数据（INSERT ... ON DUPLICATE KEY UPDATE）
+
+        Args:
+            table: 表名
+            rows: 要写入的数据字典列表，所有字典的键须一致
+            update_columns: 主键/唯一键冲突时要更新的字段，默认为全部字段
+            batch_size: 每批最多行数
+            timeout: 每条语句的超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            包含 rows, affected, batches, elapsed, rows_per_sec 的统计字典
+        """
+        if not rows:
+            return self._bulk_write(table, rows, batch_size)
+        if update_columns is None:
+            update_columns = list(rows[0].keys())
+        suffix = self._compile('upsert_suffix', table, tuple(update_columns))
+        return self._bulk_write(table, rows, batch_size, suffix, timeout)
 
-    def update(self, table: str, data: Dict, condition: str, params: Optional[Tuple] = None) -> int:
+    def update(self, table: str, data: Dict, condition: str, params: Optional[Tuple] = None,
+               timeout: Optional[float] = None) -> int:
         """
         更新数据
 
@@ -151,21 +1718,111 @@ class DatabaseManager:
             data: 要更新的数据字典
             condition: WHERE条件
             params: 条件参数
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
 
         Returns:
             受影响的行数
         """
-        set_clause = ', '.join([f"{key} = %s" for key in data.keys()])
-        query = f"UPDATE {table} SET {set_clause} WHERE {condition}"
+        query = self._compile('update', table, tuple(data), condition)
 
         # 合并参数
         all_params = tuple(data.values()) + (params if params else ())
+        # 只有改动了谓词字段的更新会改变维护计数
+        counters = [(column, value) for column, value in self._tracked(table) if column in data]
 
-        with self.get_cursor() as cursor:
-            cursor.execute(query, all_params)
-            return cursor.rowcount
+        with self.transaction() if counters else nullcontext():
+            if counters:
+                matched, before = self._matched_counts(table, counters, condition, params)
+            with self.get_cursor() as cursor:
+                rowcount = self._execute_write(cursor, query, all_params, timeout)
+            if counters:
+                # 匹配的行更新后都取 data 中的新值
+                self._adjust_counts(table, {
+                    (column, value): matched * self._matches(data[column], value) - before[(column, value)]
+                    for column, value in counters
+                })
+
+        self._written(table)
+        return rowcount
+
+    def update_many(self, table: str, key_column: str, changes: Dict[Any, Dict[str, Any]],
+                    batch_size: int = 500, touch: Optional[str] = None,
+                    timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        按主键批量更新不同行的不同字段，全部在一个事务中完成
+
+        每批生成一条 UPDATE ... SET col = CASE key WHEN ... THEN ... ELSE col END
+        WHERE key IN (...) 语句，每个字段的 CASE 只列出改动了该字段的行。
+
+        Args:
+            table: 表名
+            key_column: 主键字段
+            changes: {主键: {字段: 新值}}，只需包含改动的字段
+            batch_size: 每条语句最多更新的行数
+            touch: 同时设为 CURRENT_TIMESTAMP 的时间戳字段，例如 updated_at
+            timeout: 每条语句的超时秒数，为 None 时使用默认超时，为 0 时不限时
+
+        Returns:
+            包含 rows, affected, batches, elapsed, rows_per_sec 的统计字典
+        """
+        start = time.perf_counter()
+        result = {'rows': 0, 'affected': 0, 'batches': 0, 'elapsed': 0.0, 'rows_per_sec': 0.0}
+        changes = {key: values for key, values in changes.items() if values}
+        if not changes:
+            return result
+
+        # 为语句头和协议开销预留空间
+        packet_limit = self.max_allowed_packet() - len(table) - 1024
+        # 每批的 CASE 分支不同，无法缓存整条语句，只在开始时校验一次标识符
+        name = self._quote(table)
+        quoted = {column: self._quote(table, column)
+                  for column in dict.fromkeys(column for values in changes.values() for column in values)}
+        key_name = self._quote(table, key_column)
+        touch_name = self._quote(table, touch) if touch else None
+
+        def flush(batch: List[Tuple[str, Dict[str, str]]]) -> None:
+            columns = list(dict.fromkeys(column for _, values in batch for column in values))
+            assignments = []
+            for column in columns:
+                cases = ' '.join(f"WHEN {key} THEN {values[column]}" for key, values in batch if column in values)
+                assignments.append(f"{quoted[column]} = CASE {key_name} {cases} ELSE {quoted[column]} END")
+            if touch_name:
+                assignments.append(f"{touch_name} = CURRENT_TIMESTAMP")
+            keys = ', '.join(key for key, _ in batch)
+            query = f"UPDATE {name} SET {', '.join(assignments)} WHERE {key_name} IN ({keys})"
+            with self.get_cursor() as cursor:
+                result['affected'] += self._execute_write(cursor, query, None, timeout)
+            result['batches'] += 1
+
+        counters = [(column, value) for column, value in self._tracked(table)
+                    if column is not None and any(column in values for values in changes.values())]
+
+        with self.transaction(), self.connection_scope() as connection:
+            if counters:
+                self._adjust_counts(table, self._update_deltas(table, key_column, changes, counters, batch_size))
+            batch: List[Tuple[str, Dict[str, str]]] = []
+            size = 0
+            for key, values in changes.items():
+                literal_key = connection.literal(key)
+                literals = {column: connection.literal(value) for column, value in values.items()}
+                item_size = sum(len((literal_key + value).encode('utf-8')) + len(column) + 12
+                                for column, value in literals.items())
+                if batch and (len(batch) >= batch_size or size + item_size > packet_limit):
+                    flush(batch)
+                    batch, size = [], 0
+                batch.append((literal_key, literals))
+                size += item_size
+                result['rows'] += 1
+            if batch:
+                flush(batch)
+            self._written(table)
+
+        result['elapsed'] = time.perf_counter() - start
+        result['rows_per_sec'] = result['rows'] / result['elapsed'] if result['elapsed'] > 0 else 0.0
+        return result
 
-    def delete(self, table: str, condition: str, params: Optional[Tuple] = None) -> int:
+    def delete(self, table: str, condition: str, params: Optional[Tuple] = None,
+               timeout: Optional[float] = None) -> int:
         """
         删除数据
 
@@ -173,15 +1830,24 @@ class DatabaseManager:
             table: 表名
             condition: WHERE条件
             params: 条件参数
+            timeout: 超时秒数，为 None 时使用默认超时，为 0 时不限时
 
         Returns:
             受影响的行数
         """
-        query = f"DELETE FROM {table} WHERE {condition}"
+        query = self._compile('delete', table, (), condition)
+        counters = self._tracked(table)
 
-        with self.get_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.rowcount
+        with self.transaction() if counters else nullcontext():
+            if counters:
+                matched, before = self._matched_counts(table, counters, condition, params)
+            with self.get_cursor() as cursor:
+                rowcount = self._execute_write(cursor, query, params, timeout)
+            if counters:
+                self._adjust_counts(table, {counter: -count for counter, count in before.items()})
+
+        self._written(table)
+        return rowcount
 
     def get_one(self, table: str, condition: str = "1=1", params: Optional[Tuple] = None) -> Optional[Dict]:
         """
@@ -195,11 +1861,51 @@ class DatabaseManager:
         Returns:
             单条数据或None
         """
-        query = f"SELECT * FROM {table} WHERE {condition} LIMIT 1"
+        query = self._compile('get_one', table, (), condition)
 
-        with self.get_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchone()
+        return self._read(query, params, fetch='one')[1]
+
+    def get_by_keys(self, table: str, key_column: str, keys: List[Any], columns: Optional[List[str]] = None,
+                    batch_size: int = 500) -> Dict[Any, Dict]:
+        """
+        按主键批量获取指定字段，已取过的行走 LRU 行缓存
+
+        用于按需加载宽字段：列表只查询窄字段，用户选中的行再通过此方法补齐。
+
+        Args:
+            table: 表名
+            key_column: 主键字段
+            keys: 要获取的主键值
+            columns: 要获取的字段，默认全部字段
+            batch_size: 每条 IN 查询最多的主键数
+
+        Returns:
+            {主键值: 数据字典}，不存在的主键不出现在结果中
+        """
+        selected = [key_column] + [col for col in (columns or ['*']) if col != key_column]
+        projection = ', '.join(selected)
+        prefix = f"{table}:{projection}"
+        select = self._compile('select_in', table, tuple(selected))
+        tables = {table.lower()}
+
+        found: Dict[Any, Dict] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            hit, row = self.row_cache.get((prefix, repr(key)))
+            if hit:
+                found[key] = row
+            else:
+                missing.append(key)
+
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            query = f"{select}({_placeholders(len(batch))})"
+            for row in self._read(query, tuple(batch))[1]:
+                key = row[key_column]
+                found[key] = row
+                self.row_cache.set((prefix, repr(key)), row, tables=tables)
+
+        return found
 
     def get_all(self, table: str, condition: str = "1=1", params: Optional[Tuple] = None) -> List[Dict]:
         """
@@ -213,13 +1919,12 @@ class DatabaseManager:
         Returns:
             数据列表
         """
-        query = f"SELECT * FROM {table} WHERE {condition}"
+        query = self._compile('get_all', table, (), condition)
 
-        with self.get_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        return self._read(query, params)[1]
 
-    def count(self, table: str, condition: str = "1=1", params: Optional[Tuple] = None) -> int:
+    def count(self, table: str, condition: str = "1=1", params: Optional[Tuple] = None,
+              mode: str = 'exact') -> int:
         """
         统计数量
 
@@ -227,16 +1932,218 @@ class DatabaseManager:
             table: 表名
             condition: WHERE条件
             params: 条件参数
+            mode: 'exact' 执行 COUNT(*)；'estimate' 取 EXPLAIN 的预估行数，不读数据；
+                'maintained' 读取写操作维护的计数行，条件未登记（见 track_count）时退回 exact
 
         Returns:
             数量
         """
-        query = f"SELECT COUNT(*) as count FROM {table} WHERE {condition}"
+        if mode not in COUNT_MODES:
+            raise ValueError(f"未知的计数模式: {mode}")
+        if mode == 'estimate':
+            return self._estimate_count(table, condition, params)
+        if mode == 'maintained':
+            counter = self._find_counter(table, condition, params)
+            if counter is not None and self._counter_table_exists():
+                return self._maintained_count(table, *counter)
 
-        with self.get_cursor() as cursor:
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            return result['count'] if result else 0
+        query = self._compile('count', table, (), condition)
+
+        result = self._read(query, params, fetch='one')[1]
+        return result['count'] if result else 0
+
+    def _estimate_count(self, table: str, condition: str, params: Optional[Tuple]) -> int:
+        """用优化器统计信息估算行数：EXPLAIN 的 rows 乘以 filtered 百分比"""
+        plan = self.execute("EXPLAIN " + self._compile('get_all', table, (), condition), params,
+                            cache_ttl=self.ESTIMATE_CACHE_TTL)
+        if not plan:
+            return 0
+        row = plan[0]
+        return int(round((row.get('rows') or 0) * float(row.get('filtered') or 100) / 100))
+
+    def track_count(self, table: str, column: Optional[str] = None, value: Any = None) -> None:
+        """
+        登记需要维护计数的表和谓词，同时登记该表的总行数
+
+        insert、insert_many、update、update_many、delete 在写入的同一事务中增减计数行；
+        execute_non_query 和 upsert_many 的影响无法推算，相关计数标记为过期，下次读取时重新统计。
+        绕过本类直接写库的程序不会更新计数，可定期调用 refresh_counts 校正。
+
+        Args:
+            table: 表名
+            column: 谓词字段，为 None 时只登记总行数
+            value: 谓词取值，即统计 column = value 的行数
+        """
+        counters = self._counters.setdefault(table.lower(), set())
+        counters.add((None, None))
+        if column is not None:
+            counters.add((column, value))
+
+    @staticmethod
+    def _predicate_key(column: Optional[str], value: Any) -> str:
+        """计数行的谓词键，整表为空字符串"""
+        return "" if column is None else f"{column} = {value!r}"
+
+    @staticmethod
+    def _matches(actual: Any, expected: Any) -> bool:
+        """按 MySQL 等值比较的宽松语义判断字段值是否满足谓词（True 与 1、'1' 与 1 相等）"""
+        if actual is None or expected is None:
+            return actual is None and expected is None
+        if isinstance(actual, (bool, np.bool_)):
+            actual = int(actual)
+        if isinstance(expected, bool):
+            expected = int(expected)
+        return actual == expected or str(actual) == str(expected)
+
+    def _find_counter(self, table: str, condition: str, params: Optional[Tuple]) -> Optional[Tuple[Optional[str], Any]]:
+        """把 count() 的条件对应到已登记的谓词，无法对应时返回 None"""
+        counters = self._counters.get(table.lower())
+        if not counters:
+            return None
+        if condition.strip() in _WHOLE_TABLE_CONDITIONS and not params:
+            return None, None
+        match = _EQUALITY_PATTERN.match(condition)
+        if not match:
+            return None
+        column, literal = match.groups()
+        if literal == '%s':
+            if not params or len(params) != 1:
+                return None
+            value = params[0]
+        elif literal.startswith("'"):
+            value = literal[1:-1]
+        else:
+            value = int(literal)
+        for tracked_column, tracked_value in counters:
+            if tracked_column == column and self._matches(value, tracked_value):
+                return tracked_column, tracked_value
+        return None
+
+    def _counter_table_exists(self) -> bool:
+        """计数表是否已由迁移创建；未创建时不维护计数，maintained 模式退回精确计数"""
+        if self._counter_table_ready is None:
+            self._counter_table_ready = self.table_exists(COUNTER_TABLE)
+        return self._counter_table_ready
+
+    def _tracked(self, table: str) -> List[Tuple[Optional[str], Any]]:
+        """表上登记的谓词列表，没有或计数表不存在时返回空列表"""
+        counters = self._counters.get(table.lower())
+        if not counters or not self._counter_table_exists():
+            return []
+        return list(counters)
+
+    def _maintained_count(self, table: str, column: Optional[str], value: Any) -> int:
+        """读取维护的计数行，缺失或过期时重新统计"""
+        rows = self.execute(f"SELECT row_count, stale FROM {COUNTER_TABLE} WHERE table_name = %s AND predicate = %s",
+                            (table.lower(), self._predicate_key(column, value)), cache_ttl=self.COUNT_CACHE_TTL)
+        if rows and not rows[0]['stale']:
+            return int(rows[0]['row_count'])
+        return self._recount(table, column, value)
+
+    def _recount(self, table: str, column: Optional[str], value: Any) -> int:
+        """
+        精确统计并写回计数行
+
+        先锁住计数行再统计：并发写入的计数增减会等到本事务提交后再叠加，不会被覆盖。
+        """
+        key = (table.lower(), self._predicate_key(column, value))
+        with self.transaction():
+            self.execute(f"SELECT row_count FROM {COUNTER_TABLE} WHERE table_name = %s AND predicate = %s FOR UPDATE",
+                         key)
+            if column is None:
+                result = self._read(self._compile('count', table, (), "1=1"), fetch='one')[1]
+            else:
+                result = self._read(self._compile('count_null_safe', table, (column,)), (value,), fetch='one')[1]
+            total = int(result['count']) if result else 0
+            self.execute_non_query(
+                f"INSERT INTO {COUNTER_TABLE} (table_name, predicate, row_count, stale, counted_at) "
+                f"VALUES (%s, %s, %s, 0, NOW()) "
+                f"ON DUPLICATE KEY UPDATE row_count = VALUES(row_count), stale = 0, counted_at = VALUES(counted_at)",
+                (*key, total),
+            )
+        return total
+
+    def refresh_counts(self, table: Optional[str] = None) -> Dict[str, int]:
+        """
+        精确重新统计已登记的维护计数
+
+        Args:
+            table: 只统计该表，为 None 时统计全部
+
+        Returns:
+            {"表名: 谓词": 行数}
+        """
+        tables = [table.lower()] if table else list(self._counters)
+        return {f"{name}: {self._predicate_key(column, value) or '*'}": self._recount(name, column, value)
+                for name in tables for column, value in self._counters.get(name, ())}
+
+    def _mark_counts_stale(self, tables) -> None:
+        """把这些表上的维护计数标记为过期"""
+        tracked = sorted(table.lower() for table in tables if self._counters.get(table.lower()))
+        if tracked and self._counter_table_exists():
+            self.execute_non_query(f"UPDATE {COUNTER_TABLE} SET stale = 1 WHERE table_name IN "
+                                   f"({', '.join(['%s'] * len(tracked))})", tuple(tracked))
+
+    def _adjust_counts(self, table: str, deltas: Dict[Tuple[Optional[str], Any], int]) -> None:
+        """在当前事务中增减计数行，尚未统计过的计数行不存在，首次读取时再精确统计"""
+        for (column, value), delta in deltas.items():
+            if delta:
+                self.execute_non_query(
+                    f"UPDATE {COUNTER_TABLE} SET row_count = row_count + %s WHERE table_name = %s AND predicate = %s",
+                    (int(delta), table.lower(), self._predicate_key(column, value)),
+                )
+
+    def _insert_deltas(self, table: str, rows: List[Dict],
+                       counters: List[Tuple[Optional[str], Any]]) -> Dict[Tuple[Optional[str], Any], int]:
+        """插入这些行后各计数的增量，行中未给出的字段按字段默认值计算"""
+        deltas = {}
+        for column, value in counters:
+            if column is None:
+                deltas[(column, value)] = len(rows)
+                continue
+            default = None
+            if any(column not in row for row in rows):
+                default = self._column_default(table, column)
+            deltas[(column, value)] = sum(self._matches(row.get(column, default), value) for row in rows)
+        return deltas
+
+    def _matched_counts(self, table: str, counters: List[Tuple[Optional[str], Any]], condition: str,
+                        params: Optional[Tuple]) -> Tuple[int, Dict[Tuple[Optional[str], Any], int]]:
+        """
+        锁定条件匹配的行，统计其中满足各谓词的行数（须在事务中调用）
+
+        Returns:
+            (匹配行数, {谓词: 满足谓词的行数})，整表谓词的值为匹配行数
+        """
+        predicates = [(column, value) for column, value in counters if column is not None]
+        query = self._compile('lock_matched', table, tuple(column for column, _ in predicates), condition)
+        row = self._read(query, tuple(value for _, value in predicates) + tuple(params or ()), fetch='one')[1]
+        matched = int(row['matched']) if row else 0
+        counts = {(None, None): matched} if (None, None) in counters else {}
+        for i, predicate in enumerate(predicates):
+            counts[predicate] = int(row[f"c{i}"] or 0) if row else 0
+        return matched, counts
+
+    def _update_deltas(self, table: str, key_column: str, changes: Dict[Any, Dict[str, Any]],
+                       counters: List[Tuple[str, Any]], batch_size: int) -> Dict[Tuple[str, Any], int]:
+        """锁定 update_many 要改动谓词字段的行，按原值和新值计算各计数的增量（须在事务中调用）"""
+        columns = sorted({column for column, _ in counters})
+        keys = [key for key, values in changes.items() if any(column in values for column in columns)]
+        deltas = {counter: 0 for counter in counters}
+        for i in range(0, len(keys), batch_size):
+            chunk = keys[i:i + batch_size]
+            select = self._compile('select_in', table, (key_column, *columns))
+            query = f"{select}({_placeholders(len(chunk))}) FOR UPDATE"
+            current = {row[key_column]: row for row in self._read(query, tuple(chunk))[1]}
+            for key in chunk:
+                row = current.get(key)
+                if row is None:
+                    continue
+                for column, value in counters:
+                    if column in changes[key]:
+                        deltas[(column, value)] += (self._matches(changes[key][column], value)
+                                                    - self._matches(row[column], value))
+        return deltas
 
     def table_exists(self, table_name: str) -> bool:
         """
@@ -255,10 +2162,137 @@ class DatabaseManager:
                   AND table_name = %s \
                 """
 
-        with self.get_cursor() as cursor:
-            cursor.execute(query, (self.config['database'], table_name))
-            result = cursor.fetchone()
-            return result['count'] > 0 if result else False
+        result = self._read(query, (self.config['database'], table_name), fetch='one')[1]
+        return result['count'] > 0 if result else False
+
+    def index_exists(self, table_name: str, index_name: str) -> bool:
+        """
+        检查索引是否存在（在主库上查询，副本可能尚未同步刚建的索引）
+
+        Args:
+            table_name: 表名
+            index_name: 索引名
+
+        Returns:
+            是否存在
+        """
+        query = """
+                SELECT COUNT(*) as count
+                FROM information_schema.statistics
+                WHERE table_schema = %s \
+                  AND table_name = %s \
+                  AND index_name = %s \
+                """
+
+        result = self._read(query, (self.config['database'], table_name, index_name), fetch='one', primary=True)[1]
+        return result['count'] > 0 if result else False
+
+    def table_columns(self, table_name: str) -> Dict[str, Any]:
+        """
+        获取表的字段及其默认值（在主库上查询，首次查询后缓存，执行 DDL 后失效）
+
+        Args:
+            table_name: 表名
+
+        Returns:
+            {字段名: 默认值}，按表中顺序；表不存在时为空字典
+        """
+        columns = self._schemas.get(table_name)
+        if columns is None:
+            query = """
+                    SELECT column_name AS name, column_default AS value
+                    FROM information_schema.columns
+                    WHERE table_schema = %s \
+                      AND table_name = %s
+                    ORDER BY ordinal_position \
+                    """
+            rows = self._read(query, (self.config['database'], table_name), primary=True)[1]
+            columns = {row['name']: row['value'] for row in rows}
+            # 不缓存不存在的表，之后建表时无需额外失效
+            if columns:
+                self._schemas[table_name] = columns
+        return columns
+
+    def _quote(self, table: str, column: Optional[str] = None) -> str:
+        """
+        按实时表结构校验表名或字段名并加反引号，未知标识符抛出 ValueError
+
+        Args:
+            table: 表名
+            column: 字段名，为 None 时校验并返回表名；为 '*' 时返回该表全部字段
+
+        Returns:
+            可直接拼入 SQL 的标识符
+        """
+        columns = self.table_columns(table)
+        if not columns:
+            raise ValueError(f"表不存在: {table}")
+        if column is None:
+            return f"`{table}`"
+        if column == '*':
+            return f"`{table}`.*"
+        if column not in columns and column.lower() not in {name.lower() for name in columns}:
+            raise ValueError(f"表 {table} 没有字段: {column}")
+        return f"`{column}`"
+
+    def _column_default(self, table: str, column: str) -> Any:
+        """字段默认值，用于推算插入时未给出的字段"""
+        columns = self.table_columns(table)
+        if column in columns:
+            return columns[column]
+        return next((value for name, value in columns.items() if name.lower() == column.lower()), None)
+
+    def _compile(self, operation: str, table: str, columns: Tuple[str, ...] = (), condition: str = "") -> str:
+        """
+        取出 (操作, 表, 字段, 条件) 对应的语句模板，首次使用时校验标识符并编译
+
+        条件是调用方给出的 SQL 片段，原样拼入模板，不做校验。
+
+        Args:
+            operation: 语句类型，见 _build_statement
+            table: 表名
+            columns: 语句涉及的字段，顺序与参数一致
+            condition: WHERE 条件
+
+        Returns:
+            带 %s 占位符的 SQL 模板
+        """
+        key = (operation, table, columns, condition)
+        statement = self.statements.get(key)
+        if statement is None:
+            statement = self._build_statement(*key)
+            self.statements.set(key, statement)
+        return statement
+
+    def _build_statement(self, operation: str, table: str, columns: Tuple[str, ...], condition: str) -> str:
+        """按实时表结构校验标识符后生成语句模板"""
+        name = self._quote(table)
+        quoted = [self._quote(table, column) for column in columns]
+        if operation == 'insert':
+            return f"INSERT INTO {name} ({', '.join(quoted)}) VALUES ({_placeholders(len(quoted))})"
+        if operation == 'insert_head':
+            return f"INSERT INTO {name} ({', '.join(quoted)}) VALUES "
+        if operation == 'upsert_suffix':
+            return " ON DUPLICATE KEY UPDATE " + ', '.join(f"{column} = VALUES({column})" for column in quoted)
+        if operation == 'update':
+            return f"UPDATE {name} SET {', '.join(f'{column} = %s' for column in quoted)} WHERE {condition}"
+        if operation == 'delete':
+            return f"DELETE FROM {name} WHERE {condition}"
+        if operation == 'get_one':
+            return f"SELECT * FROM {name} WHERE {condition} LIMIT 1"
+        if operation == 'get_all':
+            return f"SELECT * FROM {name} WHERE {condition}"
+        if operation == 'count':
+            return f"SELECT COUNT(*) as count FROM {name} WHERE {condition}"
+        if operation == 'count_null_safe':
+            return f"SELECT COUNT(*) as count FROM {name} WHERE {quoted[0]} <=> %s"
+        if operation == 'select_in':
+            # 第一个字段为主键，调用方追加 "(%s, ...)"
+            return f"SELECT {', '.join(quoted)} FROM {name} WHERE {quoted[0]} IN "
+        if operation == 'lock_matched':
+            sums = ''.join(f", SUM({column} <=> %s) AS c{i}" for i, column in enumerate(quoted))
+            return f"SELECT COUNT(*) AS matched{sums} FROM {name} WHERE {condition} FOR UPDATE"
+        raise ValueError(f"未知的语句类型: {operation}")
 
 
 # 在 Streamlit 中使用的单例模式
@@ -0,0 +1,183 @@
+import gzip
+import io
+import os
+import tempfile
+import time
+from typing import Dict, IO, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from pymysql.constants import FIELD_TYPE
+
+from lib.db_manager import DatabaseManager
+
+# 导出格式 -> (文件扩展名, MIME 类型)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+# 每次从服务端游标读取并写出的行数
+EXPORT_CHUNK_SIZE = 5000
+
+_INTEGER_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.INT24,
+                  FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR}
+_FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE, FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL}
+
+
+def _arrow_schema(description: Tuple):
+    """按游标描述中的字段类型确定 Parquet 列类型，各批次共用同一 schema"""
+    import pyarrow as pa
+
+    fields = []
+    for field in description:
+        type_code = field[1]
+        if type_code in _INTEGER_TYPES:
+            arrow_type = pa.int64()
+        elif type_code in _FLOAT_TYPES:
+            arrow_type = pa.float64()
+        elif type_code == FIELD_TYPE.DATE:
+            arrow_type = pa.date32()
+        elif type_code in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP):
+            arrow_type = pa.timestamp('us')
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(field[0], arrow_type))
+    return pa.schema(fields)
+
+
+def _arrow_batch(rows: List[Dict], schema):
+    """把一批字典行转换为符合 schema 的 Arrow 表"""
+    import pyarrow as pa
+
+    columns = {}
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if pa.types.is_floating(field.type):
+            values = [None if v is None else float(v) for v in values]
+        elif pa.types.is_string(field.type):
+            values = [v if v is None or isinstance(v, str)
+                      else v.decode('utf-8', 'replace') if isinstance(v, bytes) else str(v)
+                      for v in values]
+        columns[field.name] = pa.array(values, type=field.type)
+    return pa.table(columns, schema=schema)
+
+
+def write_csv(batches: Iterable[List[Dict]], out: IO[bytes], columns: List[str], compress: bool = False) -> int:
+    """
+    把分批的行逐批写成 CSV
+
+    Args:
+        batches: 字典行列表的迭代器
+        out: 二进制输出流
+        columns: 列顺序，也用于没有数据时写出表头
+        compress: 是否 gzip 压缩
+
+    Returns:
+        写出的行数
+    """
+    raw = gzip.GzipFile(fileobj=out, mode='wb') if compress else out
+    # 带 BOM，便于 Excel 正确识别中文
+    text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    rows = 0
+    try:
+        pd.DataFrame(columns=columns).to_csv(text, index=False)
+        for batch in batches:
+            pd.DataFrame.from_records(batch, columns=columns).to_csv(text, index=False, header=False)
+            rows += len(batch)
+        text.flush()
+    finally:
+        # 只关闭压缩层，输出流由调用方负责
+        text.detach()
+        if compress:
+            raw.close()
+    return rows
+
+
+def write_parquet(batches: Iterable[List[Dict]], out: IO[bytes], description: Tuple, compress: bool = False) -> int:
+    """
+    把分批的行逐批写成 Parquet 行组
+
+    Args:
+        batches: 字典行列表的迭代器
+        out: 二进制输出流
+        description: 查询的游标描述，用于确定列类型
+        compress: 是否使用 gzip 压缩，否则使用 snappy
+
+    Returns:
+        写出的行数
+    """
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(description)
+    rows = 0
+    with pq.ParquetWriter(out, schema, compression='gzip' if compress else 'snappy') as writer:
+        for batch in batches:
+            writer.write_table(_arrow_batch(batch, schema))
+            rows += len(batch)
+    return rows
+
+
+def export_filename(name: str, fmt: str, compress: bool = False) -> str:
+    """
+    生成导出文件名
+
+    Args:
+        name: 文件名前缀
+        fmt: 'csv' 或 'parquet'
+        compress: 是否压缩（仅 CSV 会加 .gz 后缀，Parquet 在文件内部压缩）
+
+    Returns:
+        带日期和扩展名的文件名
+    """
+    extension = EXPORT_FORMATS[fmt][0]
+    if compress and fmt == 'csv':
+        extension += '.gz'
+    return f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+def export_mime(fmt: str, compress: bool = False) -> str:
+    """导出文件的 MIME 类型"""
+    return 'application/gzip' if compress and fmt == 'csv' else EXPORT_FORMATS[fmt][1]
+
+
+def export_query(db: DatabaseManager, query: str, params: Optional[Tuple] = None, fmt: str = 'csv',
+                 compress: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE,
+                 timeout: Optional[float] = 0) -> io.RawIOBase:
+    """
+    用服务端游标流式读取查询结果并导出到磁盘临时文件
+
+    行按批从数据库读出后立即写入临时文件，本函数的内存占用只与一批行有关。
+    返回的是已打开的临时文件，关闭后自动删除；st.download_button 会把其内容读入
+    媒体存储后提供下载。
+
+    Args:
+        db: 数据库管理器
+        query: SQL查询语句
+        params: 查询参数
+        fmt: 'csv' 或 'parquet'
+        compress: 是否 gzip 压缩
+        chunk_size: 每批行数
+        timeout: 整个流式读取的超时秒数，默认 0 不限时；为 None 时使用默认查询超时
+
+    Returns:
+        定位在开头的只读临时文件（io.FileIO）
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+    description = db.describe(query, params)
+    columns = [field[0] for field in description]
+    batches = db.iter_rows(query, params, chunk_size=chunk_size, batches=True, timeout=timeout)
+    with tempfile.TemporaryFile() as out:
+        try:
+            if fmt == 'csv':
+                write_csv(batches, out, columns, compress)
+            else:
+                write_parquet(batches, out, description, compress)
+        finally:
+            batches.close()
+        out.flush()
+        # 临时文件已无路径，复制文件描述符交给调用方；st.download_button 只接受原始文件对象
+        result = io.FileIO(os.dup(out.fileno()), 'rb')
+    result.seek(0)
+    return result
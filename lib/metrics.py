@@ -0,0 +1,69 @@
+import threading
+from datetime import date
+from typing import Any, Dict, Tuple
+
+import pandas as pd
+import streamlit as st
+
+
+def table_counts(frame: pd.DataFrame, flag: str, group: str = 'task_group') -> Dict[str, Any]:
+    """
+    由表镜像计算计数
+
+    Args:
+        frame: 表镜像数据，包含 flag、group 和 updated_at 字段
+        flag: 表示"运行中"的 0/1 字段
+        group: 分组字段
+
+    Returns:
+        包含 total、active、updated_today 和 groups（{分组: {'total', 'active'}}）的字典
+    """
+    flags = frame[flag].fillna(0).astype(bool)
+    updated = pd.to_datetime(frame['updated_at'])
+    today = pd.Timestamp(date.today())
+    updated_today = (updated >= today) & (updated < today + pd.Timedelta(days=1))
+    grouped = flags.groupby(frame[group].fillna('-'), sort=False).agg(['size', 'sum'])
+    return {
+        'total': len(frame),
+        'active': int(flags.sum()),
+        'updated_today': int(updated_today.sum()),
+        'groups': {key: {'total': int(size), 'active': int(active)} for key, (size, active) in grouped.iterrows()},
+    }
+
+
+class DashboardMetrics:
+    """仪表板指标：由后台同步的 tasks/users 表镜像计算，不访问数据库"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 名称 -> (镜像数据, 计算日期, 计数)；镜像每次同步有变化时替换为新对象
+        self._counts: Dict[str, Tuple[pd.DataFrame, date, Dict[str, Any]]] = {}
+
+    def counts(self, name: str, frame: pd.DataFrame, flag: str, group: str = 'task_group') -> Dict[str, Any]:
+        """
+        获取镜像的计数，镜像和日期都未变化时直接返回上次的结果
+
+        Args:
+            name: 计数名称，例如 'tasks'
+            frame: 表镜像数据
+            flag: 表示"运行中"的 0/1 字段
+            group: 分组字段
+
+        Returns:
+            见 table_counts
+        """
+        today = date.today()
+        with self._lock:
+            cached = self._counts.get(name)
+            if cached is not None and cached[0] is frame and cached[1] == today:
+                return cached[2]
+        counts = table_counts(frame, flag, group)
+        with self._lock:
+            self._counts[name] = (frame, today, counts)
+        return counts
+
+
+@st.cache_resource
+def get_metrics():
+    """获取仪表板指标单例"""
+    return DashboardMetrics()
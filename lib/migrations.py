@@ -0,0 +1,277 @@
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import streamlit as st
+
+from lib.db_manager import COUNTER_TABLE_DDL, DatabaseManager, get_db
+from lib.rollups import DAILY_TABLE, ROLLUP_DDL
+from lib.session_store import SESSION_TABLE, SESSION_TABLE_DDL
+from lib.task_assignment import ASSIGNMENT_TABLE_DDL, RUNNING_TASKS_SQL, RUNNING_USERS_SQL
+
+# 已执行迁移的记录表
+MIGRATION_TABLE = "schema_migrations"
+
+MIGRATION_TABLE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {MIGRATION_TABLE} (
+    version INT NOT NULL PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL,
+    elapsed DOUBLE NOT NULL
+)
+"""
+
+# 多个进程同时启动时只有一个执行迁移
+MIGRATION_LOCK = "schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 60
+
+# 迁移体系建立之前就存在的表，结构以生产库为准，迁移不创建它们
+BASELINE_TABLES = ("tasks", "users", "admins")
+
+# 迁移步骤：SQL 语句，或接收数据库管理器的函数
+Step = Union[str, Callable[[DatabaseManager], None]]
+
+
+class QueryPlanError(Exception):
+    """热点查询的执行计划退化为全表扫描"""
+
+    def __init__(self, failures: List[Dict[str, Any]]):
+        self.failures = failures
+        names = ", ".join(sorted({failure['name'] for failure in failures}))
+        super().__init__(f"{len(failures)} 处全表扫描: {names}")
+
+
+class Migration:
+    """一个版本的结构变更，版本号只增不改，已发布的迁移不再修改"""
+
+    __slots__ = ('version', 'description', 'steps')
+
+    def __init__(self, version: int, description: str, steps: Sequence[Step]):
+        self.version = version
+        self.description = description
+        self.steps = list(steps)
+
+
+def add_index(table: str, name: str, columns: Sequence[str], unique: bool = False) -> Callable[[DatabaseManager], None]:
+    """
+    生成建索引的迁移步骤，索引已存在时跳过（MySQL 不支持 CREATE INDEX IF NOT EXISTS）
+
+    Args:
+        table: 表名
+        name: 索引名
+        columns: 索引字段，按顺序
+        unique: 是否唯一索引
+
+    Returns:
+        迁移步骤函数
+    """
+    def step(db: DatabaseManager) -> None:
+        if not db.index_exists(table, name):
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            db.execute_non_query(f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)})", timeout=0)
+    step.__doc__ = f"{table}.{name}({', '.join(columns)})"
+    return step
+
+
+def require_tables(tables: Sequence[str]) -> Callable[[DatabaseManager], None]:
+    """
+    生成基线检查步骤：只确认表已存在，不做任何结构变更
+
+    Args:
+        tables: 表名
+
+    Returns:
+        迁移步骤函数，有表不存在时抛出 RuntimeError
+    """
+    def step(db: DatabaseManager) -> None:
+        missing = [table for table in tables if not db.table_exists(table)]
+        if missing:
+            raise RuntimeError(f"基线表不存在: {', '.join(missing)}，请先从生产库导入表结构")
+    step.__doc__ = f"require {', '.join(tables)}"
+    return step
+
+
+MIGRATIONS = [
+    Migration(1, "基线：已有的 tasks、users、admins 表", [require_tables(BASELINE_TABLES)]),
+    Migration(2, "创建任务分配、会话和活动汇总表", [ASSIGNMENT_TABLE_DDL, SESSION_TABLE_DDL, *ROLLUP_DDL]),
+    Migration(3, "热点查询的覆盖索引", [
+        # 分配器载入运行中的任务/用户，索引覆盖查询的全部字段
+        add_index("tasks", "idx_tasks_run", ["is_run", "task_group", "weight", "click_rate"]),
+        add_index("users", "idx_users_running", ["is_running", "task_group", "browser_count"]),
+        # 镜像按 updated_at 水位增量同步，列表按 (updated_at, task_id) 分页
+        add_index("tasks", "idx_tasks_updated_at", ["updated_at"]),
+        add_index("users", "idx_users_updated_at", ["updated_at"]),
+        # 按用户的 task_group 筛选任务并按 updated_at 排序导出
+        add_index("tasks", "idx_tasks_group_updated_at", ["task_group", "updated_at"]),
+        add_index("users", "idx_users_task_group", ["task_group"]),
+        # 登录按用户名查管理员
+        add_index("admins", "uq_admins_username", ["username"], unique=True),
+    ]),
+    Migration(4, "创建维护计数表", [COUNTER_TABLE_DDL]),
+]
+
+
+def _recent(seconds: float) -> Callable[[], Tuple]:
+    """生成以当前时间为基准的查询参数，使检查贴近真实的增量窗口"""
+    return lambda: (datetime.now() - timedelta(seconds=seconds),)
+
+
+# 热点查询：名称 -> (SQL, 参数或返回参数的函数)，参数取有代表性的值
+HOT_QUERIES: Dict[str, Tuple[str, Union[Tuple, Callable[[], Tuple], None]]] = {
+    'login': ("SELECT * FROM admins WHERE username = %s", ('admin',)),
+    'running_tasks': (RUNNING_TASKS_SQL, None),
+    'running_users': (RUNNING_USERS_SQL, None),
+    'task_mirror_delta': ("SELECT * FROM tasks WHERE updated_at >= %s", _recent(60)),
+    'user_mirror_delta': ("SELECT * FROM users WHERE updated_at >= %s", _recent(60)),
+    'task_export_by_user': (
+        "SELECT * FROM tasks WHERE task_group IN (SELECT task_group FROM users WHERE user_name = %s) "
+        "AND updated_at >= %s AND updated_at < %s ORDER BY updated_at, task_id",
+        lambda: ('user', datetime.now() - timedelta(days=7), datetime.now()),
+    ),
+    'session_resolve': (f"SELECT * FROM {SESSION_TABLE} WHERE session_hash = %s AND expires_at > %s",
+                        lambda: ('0' * 64, datetime.now())),
+    'task_activity_daily': (
+        f"SELECT task_id, runs, clicks FROM {DAILY_TABLE} WHERE bucket_start >= %s AND bucket_start < %s",
+        lambda: (datetime.now() - timedelta(days=90), datetime.now()),
+    ),
+}
+
+
+def register_hot_query(name: str, query: str, params: Union[Tuple, Callable[[], Tuple], None] = None) -> None:
+    """
+    登记一个需要索引支撑的查询形状，供 check_hot_queries 检查
+
+    Args:
+        name: 名称，同名时覆盖
+        query: SQL查询语句
+        params: 有代表性的参数，或返回参数的无参函数
+    """
+    HOT_QUERIES[name] = (query, params)
+
+
+# EXPLAIN 的 type 为这两种时表示读取了整张表或整个索引
+_FULL_SCAN_TYPES = {'ALL', 'index'}
+
+
+def check_hot_queries(db: DatabaseManager, names: Optional[Sequence[str]] = None, min_rows: int = 100,
+                      raise_on_failure: bool = True) -> List[Dict[str, Any]]:
+    """
+    对登记的热点查询执行 EXPLAIN，检查是否有全表扫描
+
+    优化器对很小的表可能直接扫描，预估行数低于 min_rows 的扫描不算失败。
+    派生表、子查询物化表（表名形如 <derived2>）不检查。
+
+    Args:
+        db: 数据库管理器
+        names: 要检查的查询名，为 None 时检查全部
+        min_rows: 全表扫描预估行数达到该值时判为失败
+        raise_on_failure: 有失败时是否抛出 QueryPlanError
+
+    Returns:
+        EXPLAIN 结果行，每行附加 name 和 full_scan 字段
+    """
+    results = []
+    for name in (names if names is not None else list(HOT_QUERIES)):
+        query, params = HOT_QUERIES[name]
+        if callable(params):
+            params = params()
+        for row in db.explain(query, params, primary=True):
+            table = row.get('table') or ''
+            full_scan = (row.get('type') in _FULL_SCAN_TYPES and not table.startswith('<')
+                         and (row.get('rows') or 0) >= min_rows)
+            results.append({'name': name, 'full_scan': full_scan, **row})
+
+    failures = [row for row in results if row['full_scan']]
+    if failures and raise_on_failure:
+        raise QueryPlanError(failures)
+    return results
+
+
+class Migrator:
+    """按版本号顺序执行未执行过的迁移"""
+
+    def __init__(self, db: DatabaseManager, migrations: Sequence[Migration] = MIGRATIONS):
+        """
+        初始化迁移执行器
+
+        Args:
+            db: 数据库管理器
+            migrations: 迁移列表
+        """
+        versions = [migration.version for migration in migrations]
+        if versions != sorted(set(versions)):
+            raise ValueError("迁移版本号必须唯一且递增")
+        self.db = db
+        self.migrations = list(migrations)
+
+    def applied(self) -> Dict[int, Dict[str, Any]]:
+        """已执行的迁移，{版本号: 记录}；记录表尚未创建时为空（记录表只在 migrate 中创建）"""
+        # 借出主库连接，避免从尚未同步的副本读到旧记录
+        with self.db.connection_scope():
+            if not self.db.table_exists(MIGRATION_TABLE):
+                return {}
+            rows = self.db.execute(f"SELECT version, description, applied_at, elapsed FROM {MIGRATION_TABLE}")
+        return {row['version']: row for row in rows}
+
+    def pending(self) -> List[Migration]:
+        """尚未执行的迁移"""
+        applied = self.applied()
+        return [migration for migration in self.migrations if migration.version not in applied]
+
+    def status(self) -> List[Dict[str, Any]]:
+        """每个迁移的执行情况，用于诊断页面展示"""
+        applied = self.applied()
+        return [{
+            'version': migration.version,
+            'description': migration.description,
+            'applied_at': applied.get(migration.version, {}).get('applied_at'),
+            'elapsed': applied.get(migration.version, {}).get('elapsed'),
+        } for migration in self.migrations]
+
+    def migrate(self, target: Optional[int] = None) -> List[int]:
+        """
+        执行未执行的迁移，直到 target 版本（包含）
+
+        在同一个连接上持有命名锁，多个进程同时调用时依次执行，后到的进程只会看到已完成的迁移。
+        DDL 在 MySQL 中会隐式提交，因此每个迁移的步骤都写成可重复执行，中途失败后重跑即可。
+
+        Args:
+            target: 目标版本号，为 None 时执行到最新
+
+        Returns:
+            本次执行的版本号列表
+        """
+        executed = []
+        with self.db.connection_scope():
+            # DDL 的耗时与表大小有关，迁移中的语句都不受默认查询超时限制
+            locked = self.db.execute("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT),
+                                     timeout=0)
+            if not locked or not locked[0]['locked']:
+                raise TimeoutError(f"等待迁移锁超过 {MIGRATION_LOCK_TIMEOUT} 秒")
+            try:
+                self.db.execute_non_query(MIGRATION_TABLE_DDL, timeout=0)
+                for migration in self.pending():
+                    if target is not None and migration.version > target:
+                        break
+                    start = time.perf_counter()
+                    for step in migration.steps:
+                        if callable(step):
+                            step(self.db)
+                        else:
+                            self.db.execute_non_query(step, timeout=0)
+                    self.db.insert(MIGRATION_TABLE, {
+                        'version': migration.version,
+                        'description': migration.description,
+                        'applied_at': datetime.now().replace(microsecond=0),
+                        'elapsed': time.perf_counter() - start,
+                    })
+                    executed.append(migration.version)
+            finally:
+                self.db.execute("SELECT RELEASE_LOCK(%s) AS released", (MIGRATION_LOCK,))
+        return executed
+
+
+@st.cache_resource
+def get_migrator():
+    """获取迁移执行器单例"""
+    return Migrator(get_db())
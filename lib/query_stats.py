@@ -0,0 +1,208 @@
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收纳其余所有值
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"(\(\?\+\))(?:\s*,\s*\(\?\+\))+")
+# 超时等优化器提示不改变查询的形状
+_OPTIMIZER_HINT = re.compile(r"/\*\+.*?\*/", re.DOTALL)
+
+_context = threading.local()
+
+
+def set_page(page: Optional[str]) -> None:
+    """记录当前线程正在渲染的页面，作为其后查询的来源"""
+    _context.page = page
+
+
+def current_page() -> Optional[str]:
+    """获取当前线程正在渲染的页面"""
+    return getattr(_context, 'page', None)
+
+
+def fingerprint(query: str) -> str:
+    """
+    计算 SQL 指纹：去掉字面量和多余空白，同形查询得到相同指纹
+
+    Args:
+        query: SQL语句（可以已内联参数）
+
+    Returns:
+        规范化后的指纹字符串
+    """
+    text = _STRING_LITERAL.sub('?', _OPTIMIZER_HINT.sub('', query))
+    text = _NUMBER_LITERAL.sub('?', text).replace('%s', '?')
+    text = _PLACEHOLDER_LIST.sub('(?+)', text)
+    text = _VALUES_LIST.sub(r'\1', text)
+    return ' '.join(text.split())
+
+
+def estimate_bytes(rows: Any, sample_size: int = 20) -> int:
+    """
+    根据前若干行估算结果集的字节数
+
+    Args:
+        rows: 字典或元组的序列
+        sample_size: 采样行数
+
+    Returns:
+        近似字节数
+    """
+    if not rows:
+        return 0
+    sample = rows[:sample_size]
+    total = 0
+    for row in sample:
+        values = row.values() if isinstance(row, dict) else row
+        for value in values:
+            total += len(value) if isinstance(value, (str, bytes)) else 8
+    return total * len(rows) // len(sample)
+
+
+class _FingerprintStats:
+    """单个查询指纹的累计统计"""
+
+    __slots__ = ('query', 'count', 'total_time', 'max_time', 'rows', 'bytes',
+                 'samples', 'histogram', 'pages')
+
+    def __init__(self, query: str, max_samples: int):
+        self.query = query
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.samples = deque(maxlen=max_samples)
+        self.histogram = [0] * len(LATENCY_BUCKETS_MS)
+        self.pages: Dict[str, int] = {}
+
+
+class QueryStats:
+    """按查询指纹汇总的延迟、行数和字节统计，以及慢查询日志"""
+
+    def __init__(self, slow_threshold: float = 1.0, max_samples: int = 1000, max_slow: int = 200,
+                 max_fingerprints: int = 500):
+        """
+        初始化查询统计
+
+        Args:
+            slow_threshold: 慢查询阈值（秒）
+            max_samples: 每个指纹保留用于计算分位数的最近样本数
+            max_slow: 慢查询日志保留条数
+            max_fingerprints: 最多跟踪的指纹数，超出后新指纹归入 "<other>"
+        """
+        self.slow_threshold = slow_threshold
+        self.max_samples = max_samples
+        self.max_fingerprints = max_fingerprints
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _FingerprintStats] = {}
+        self._slow = deque(maxlen=max_slow)
+
+    def record(self, query: str, elapsed: float, rows: int = 0, nbytes: int = 0,
+               page: Optional[str] = None) -> None:
+        """
+        记录一次查询
+
+        Args:
+            query: 实际执行的 SQL
+            elapsed: 耗时（秒）
+            rows: 返回或影响的行数
+            nbytes: 结果集近似字节数
+            page: 发起查询的页面，默认取当前线程的页面
+        """
+        key = fingerprint(query)
+        page = page or current_page() or '-'
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    key = '<other>'
+                    stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = _FingerprintStats(key, self.max_samples)
+            stats.count += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.rows += max(rows, 0)
+            stats.bytes += nbytes
+            stats.samples.append(elapsed)
+            stats.histogram[bucket] += 1
+            stats.pages[page] = stats.pages.get(page, 0) + 1
+
+            if elapsed >= self.slow_threshold:
+                self._slow.append({
+                    'time': time.time(),
+                    'fingerprint': key,
+                    'query': query,
+                    'elapsed': elapsed,
+                    'rows': rows,
+                    'page': page,
+                })
+
+        if elapsed >= self.slow_threshold:
+            logger.warning("慢查询 %.3fs [%s] %s", elapsed, page, query)
+
+    @staticmethod
+    def _percentile(ordered: List[float], fraction: float) -> float:
+        """已排序样本的分位数（最近秩法）"""
+        if not ordered:
+            return 0.0
+        index = max(0, math.ceil(fraction * len(ordered)) - 1)
+        return ordered[index]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        获取每个指纹的汇总统计，按总耗时降序
+
+        Returns:
+            包含次数、p50/p95/p99、平均行数和字节数、来源页面及直方图的字典列表
+        """
+        with self._lock:
+            snapshot = [
+                (stats, sorted(stats.samples), list(stats.histogram), dict(stats.pages))
+                for stats in self._stats.values()
+            ]
+
+        result = []
+        for stats, ordered, histogram, pages in snapshot:
+            result.append({
+                'fingerprint': stats.query,
+                'count': stats.count,
+                'total_s': stats.total_time,
+                'p50_ms': self._percentile(ordered, 0.50) * 1000,
+                'p95_ms': self._percentile(ordered, 0.95) * 1000,
+                'p99_ms': self._percentile(ordered, 0.99) * 1000,
+                'max_ms': stats.max_time * 1000,
+                'avg_rows': stats.rows / stats.count,
+                'avg_bytes': stats.bytes / stats.count,
+                'pages': ', '.join(sorted(pages)),
+                'histogram': histogram,
+            })
+        result.sort(key=lambda item: item['total_s'], reverse=True)
+        return result
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """获取慢查询日志，最新的在前"""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self) -> None:
+        """清空所有统计"""
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
@@ -0,0 +1,254 @@
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from lib.db_manager import DatabaseManager, get_db
+
+# 原始任务活动事件，每次运行或点击一行
+EVENT_TABLE = "task_events"
+HOURLY_TABLE = "task_activity_hourly"
+DAILY_TABLE = "task_activity_daily"
+# 各汇总已处理到的事件ID
+STATE_TABLE = "rollup_state"
+ROLLUP_NAME = "task_activity"
+
+# 表结构由 lib/migrations.py 的迁移创建
+ROLLUP_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {EVENT_TABLE} (
+        id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        task_id INT NOT NULL,
+        user_name VARCHAR(64) NULL,
+        event_type ENUM('run', 'click') NOT NULL,
+        created_at DATETIME NOT NULL,
+        KEY idx_task_events_created_at (created_at)
+    )
+    """,
+    *(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        task_id INT NOT NULL,
+        bucket_start DATETIME NOT NULL,
+        runs INT NOT NULL DEFAULT 0,
+        clicks INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (task_id, bucket_start),
+        KEY idx_{table}_bucket (bucket_start)
+    )
+    """ for table in (HOURLY_TABLE, DAILY_TABLE)),
+    f"""
+    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+        name VARCHAR(64) NOT NULL PRIMARY KEY,
+        last_event_id BIGINT NOT NULL
+    )
+    """,
+]
+
+# 汇总表 -> 把 created_at 截断到桶起点的表达式
+_BUCKETS = {
+    HOURLY_TABLE: "TIMESTAMP(DATE(created_at), MAKETIME(HOUR(created_at), 0, 0))",
+    DAILY_TABLE: "TIMESTAMP(DATE(created_at))",
+}
+
+_COUNTS = "SUM(event_type = 'run'), SUM(event_type = 'click')"
+_COUNTS_AS = "SUM(event_type = 'run') AS runs, SUM(event_type = 'click') AS clicks"
+
+
+def date_range(start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    """把包含两端的日期范围转换为 [start, end) 时间区间"""
+    return (datetime.combine(start_date, datetime.min.time()),
+            datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+
+
+def activity_range(start_date: date, end_date: date, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    把日期范围转换为活动查询区间，结束时间不晚于当前时间
+
+    范围包含今天时，今天只有已经过去的部分：其中的整小时读小时表，当前这一小时读原始事件。
+
+    Args:
+        start_date: 开始日期（包含）
+        end_date: 结束日期（包含）
+        now: 当前时间，为 None 时取 datetime.now()
+
+    Returns:
+        [start, end) 时间区间
+    """
+    start, end = date_range(start_date, end_date)
+    return start, max(start, min(end, now or datetime.now()))
+
+
+def _floor_day(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+
+def _ceil_day(value: datetime) -> datetime:
+    floor = _floor_day(value)
+    return floor if floor == value else floor + timedelta(days=1)
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(value: datetime) -> datetime:
+    floor = _floor_hour(value)
+    return floor if floor == value else floor + timedelta(hours=1)
+
+
+class ActivityRollup:
+    """任务活动的小时/天级汇总，按事件ID增量维护，按日期范围组合查询"""
+
+    def __init__(self, db: DatabaseManager, batch_limit: int = 500000, settle_seconds: int = 60):
+        """
+        初始化活动汇总
+
+        Args:
+            db: 数据库管理器
+            batch_limit: 每次 refresh 最多处理的事件数
+            settle_seconds: 只汇总创建超过该秒数的事件，须大于写入事件的事务的最长持续时间
+        """
+        self.db = db
+        self.batch_limit = batch_limit
+        self.settle_seconds = settle_seconds
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        把上次处理之后的新事件累加进小时表和天表
+
+        汇总在服务端以 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE 完成，事件不经过本进程，
+        耗时随 batch_limit 增长，不受默认查询超时限制；
+        状态行加锁，多个进程同时刷新时依次执行，不会重复累加。
+
+        自增ID在提交前分配，持有较小ID的事务可能晚于较大ID提交；水位一旦越过某个ID，
+        之后才提交的该事件就永远不会被汇总。因此水位只推进到创建超过 settle_seconds
+        的事件中最大的ID，较新的事件留到之后的刷新，查询时由 build_query 从原始事件补上。
+
+        Returns:
+            包含 events（本次处理的事件ID跨度）、last_event_id、elapsed 的字典
+        """
+        start = time.perf_counter()
+        with self.db.transaction():
+            state = self.db.execute(f"SELECT last_event_id FROM {STATE_TABLE} WHERE name = %s FOR UPDATE",
+                                    (ROLLUP_NAME,))
+            last = state[0]['last_event_id'] if state else 0
+            row = self.db.execute(f"SELECT MAX(id) AS max_id FROM {EVENT_TABLE} "
+                                  f"WHERE id > %s AND created_at < NOW() - INTERVAL %s SECOND",
+                                  (last, self.settle_seconds))
+            upper = min(row[0]['max_id'] or last, last + self.batch_limit)
+            if upper > last:
+                for table, bucket in _BUCKETS.items():
+                    self.db.execute_non_query(
+                        f"INSERT INTO {table} (task_id, bucket_start, runs, clicks) "
+                        f"SELECT task_id, {bucket} AS bucket, {_COUNTS} FROM {EVENT_TABLE} "
+                        f"WHERE id > %s AND id <= %s GROUP BY task_id, bucket "
+                        f"ON DUPLICATE KEY UPDATE runs = runs + VALUES(runs), clicks = clicks + VALUES(clicks)",
+                        (last, upper), timeout=0,
+                    )
+                self.db.execute_non_query(
+                    f"INSERT INTO {STATE_TABLE} (name, last_event_id) VALUES (%s, %s) "
+                    f"ON DUPLICATE KEY UPDATE last_event_id = VALUES(last_event_id)",
+                    (ROLLUP_NAME, upper),
+                )
+        return {'events': upper - last, 'last_event_id': upper, 'elapsed': time.perf_counter() - start}
+
+    @staticmethod
+    def plan(start: datetime, end: datetime) -> List[Tuple[str, datetime, datetime]]:
+        """
+        把 [start, end) 拆成尽量粗的桶
+
+        中间的整天读天表，两端不足一天的整小时读小时表，不足一小时的边角读原始事件。
+
+        Args:
+            start: 起始时间（包含）
+            end: 结束时间（不包含）
+
+        Returns:
+            [(表名, 起始, 结束)]，按时间顺序排列
+        """
+        def hours(lo: datetime, hi: datetime) -> List[Tuple[str, datetime, datetime]]:
+            hour_lo, hour_hi = _ceil_hour(lo), _floor_hour(hi)
+            if hour_lo >= hour_hi:
+                return [(EVENT_TABLE, lo, hi)]
+            return [(EVENT_TABLE, lo, hour_lo), (HOURLY_TABLE, hour_lo, hour_hi), (EVENT_TABLE, hour_hi, hi)]
+
+        if start >= end:
+            return []
+        day_lo, day_hi = _ceil_day(start), _floor_day(end)
+        if day_lo >= day_hi:
+            segments = hours(start, end)
+        else:
+            segments = hours(start, day_lo) + [(DAILY_TABLE, day_lo, day_hi)] + hours(day_hi, end)
+        return [segment for segment in segments if segment[1] < segment[2]]
+
+    def build_query(self, start: datetime, end: datetime, by: str = 'task',
+                    task_ids: Optional[Sequence[int]] = None) -> Tuple[str, Tuple]:
+        """
+        按查询计划生成一条 UNION ALL 汇总查询
+
+        汇总表覆盖的区间再加上尚未汇总的新事件（ID 大于状态表水位），结果与直接扫描原始事件一致。
+
+        Args:
+            start: 起始时间（包含）
+            end: 结束时间（不包含）
+            by: 'task' 按任务汇总，'day' 按天汇总
+            task_ids: 只统计这些任务，为 None 时统计全部
+
+        Returns:
+            (SQL, 参数)，结果列为 task_id 或 day，以及 runs、clicks
+        """
+        if by not in ('task', 'day'):
+            raise ValueError(f"未知的汇总维度: {by}")
+        task_filter, task_params = "", ()
+        if task_ids is not None:
+            task_filter = f" AND task_id IN ({', '.join(['%s'] * len(task_ids))})" if task_ids else " AND 1 = 0"
+            task_params = tuple(task_ids)
+        watermark = f"(SELECT COALESCE(MAX(last_event_id), 0) FROM {STATE_TABLE} WHERE name = %s)"
+
+        parts, params = [], []
+        for table, lo, hi in self.plan(start, end):
+            if table == EVENT_TABLE:
+                parts.append(f"SELECT task_id, DATE(created_at) AS day, {_COUNTS_AS} FROM {EVENT_TABLE} "
+                             f"WHERE created_at >= %s AND created_at < %s{task_filter} GROUP BY task_id, day")
+                params += [lo, hi, *task_params]
+            else:
+                parts.append(f"SELECT task_id, DATE(bucket_start) AS day, runs, clicks FROM {table} "
+                             f"WHERE bucket_start >= %s AND bucket_start < %s{task_filter}")
+                params += [lo, hi, *task_params]
+                parts.append(f"SELECT task_id, DATE(created_at) AS day, {_COUNTS_AS} FROM {EVENT_TABLE} "
+                             f"WHERE id > {watermark} AND created_at >= %s AND created_at < %s{task_filter} "
+                             f"GROUP BY task_id, day")
+                params += [ROLLUP_NAME, lo, hi, *task_params]
+
+        key = 'task_id' if by == 'task' else 'day'
+        if not parts:
+            return f"SELECT NULL AS {key}, 0 AS runs, 0 AS clicks FROM DUAL WHERE 1 = 0", ()
+        union = " UNION ALL ".join(parts)
+        query = (f"SELECT {key}, SUM(runs) AS runs, SUM(clicks) AS clicks "
+                 f"FROM ({union}) AS segments GROUP BY {key} ORDER BY {key}")
+        return query, tuple(params)
+
+    def activity(self, start_date: date, end_date: date, by: str = 'task',
+                 task_ids: Optional[Sequence[int]] = None, cache_ttl: Optional[float] = None) -> pd.DataFrame:
+        """
+        查询日期范围内的任务活动
+
+        Args:
+            start_date: 开始日期（包含）
+            end_date: 结束日期（包含）
+            by: 'task' 按任务汇总，'day' 按天汇总
+            task_ids: 只统计这些任务，为 None 时统计全部
+            cache_ttl: 结果缓存秒数
+
+        Returns:
+            包含 task_id 或 day，以及 runs、clicks 的 DataFrame
+        """
+        start, end = activity_range(start_date, end_date)
+        return self.db.execute_df(*self.build_query(start, end, by, task_ids), cache_ttl=cache_ttl)
+
+
+@st.cache_resource
+def get_rollup():
+    """获取任务活动汇总单例"""
+    return ActivityRollup(get_db())
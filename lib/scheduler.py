@@ -0,0 +1,219 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import streamlit as st
+
+from lib.db_manager import query_owner
+from lib.query_stats import current_page, set_page
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    """一个已注册的后台刷新任务"""
+
+    __slots__ = ('name', 'fn', 'interval', 'value', 'completed_at', 'elapsed', 'error',
+                 'next_run', 'running', 'done', 'runs')
+
+    def __init__(self, name: str, fn: Callable[[], Any], interval: float):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.value = None
+        self.completed_at: Optional[float] = None
+        self.elapsed = 0.0
+        self.error: Optional[str] = None
+        self.next_run = time.monotonic()
+        self.running = False
+        # 当前这一轮执行完成时置位，供等待首个结果的调用方使用
+        self.done = threading.Event()
+        self.runs = 0
+
+
+class RefreshScheduler:
+    """后台预计算重查询，页面只读取最近一次完成的结果"""
+
+    def __init__(self, max_workers: int = 4, poll_interval: float = 1.0):
+        """
+        初始化调度器并启动后台线程
+
+        Args:
+            max_workers: 同时执行的任务数上限
+            poll_interval: 调度线程空闲时的最长休眠秒数
+        """
+        self.poll_interval = poll_interval
+        self._jobs: Dict[str, _Job] = {}
+        self._lock = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresh")
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+
+    def register(self, name: str, fn: Callable[[], Any], interval: float) -> None:
+        """
+        注册刷新任务，同名任务已存在时不做任何事
+
+        Args:
+            name: 任务名
+            fn: 无参函数，返回要缓存的结果
+            interval: 刷新间隔秒数
+        """
+        with self._lock:
+            if name in self._jobs:
+                return
+            self._jobs[name] = _Job(name, fn, interval)
+            self._lock.notify()
+
+    def _run(self, job: _Job) -> None:
+        """执行一次任务并保存结果；get/refresh 会在页面线程上调用，执行完恢复该线程的页面"""
+        page = current_page()
+        set_page(f"scheduler:{job.name}")
+        start = time.monotonic()
+        try:
+            # 结果为所有会话共享，不随触发它的那次脚本运行一起取消
+            with query_owner(None):
+                value = job.fn()
+            error = None
+        except Exception as e:
+            logger.exception("后台刷新 %s 失败", job.name)
+            value, error = None, str(e)
+        finally:
+            set_page(page)
+
+        with self._lock:
+            if error is None:
+                job.value = value
+                job.completed_at = time.monotonic()
+            job.error = error
+            job.elapsed = time.monotonic() - start
+            job.runs += 1
+            job.running = False
+            job.next_run = time.monotonic() + job.interval
+            job.done.set()
+            self._lock.notify()
+
+    def _start(self, job: _Job) -> bool:
+        """标记任务开始执行；已在执行中时返回 False（调用方需持有锁）"""
+        if job.running:
+            return False
+        job.running = True
+        job.done.clear()
+        return True
+
+    def _loop(self) -> None:
+        """调度线程：提交到期的任务"""
+        while True:
+            with self._lock:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                due = [job for job in self._jobs.values() if job.next_run <= now and self._start(job)]
+                if not due:
+                    next_run = min((job.next_run for job in self._jobs.values() if not job.running),
+                                   default=now + self.poll_interval)
+                    self._lock.wait(min(self.poll_interval, max(0.0, next_run - now)))
+                    continue
+            for job in due:
+                self._executor.submit(self._run, job)
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        读取任务最近一次完成的结果
+
+        已有结果时立即返回，不等待刷新；还没有结果时，同一时刻只有一个调用方
+        真正执行查询，其他调用方等待同一次执行的结果。
+
+        Args:
+            name: 任务名
+            timeout: 等待首个结果的最长秒数
+
+        Returns:
+            包含 value、age（秒）、elapsed、error 的字典
+        """
+        with self._lock:
+            job = self._jobs[name]
+            run_here = job.completed_at is None and self._start(job)
+
+        if run_here:
+            self._run(job)
+        elif job.completed_at is None:
+            job.done.wait(timeout)
+
+        with self._lock:
+            return {
+                'value': job.value,
+                'age': None if job.completed_at is None else time.monotonic() - job.completed_at,
+                'elapsed': job.elapsed,
+                'error': job.error,
+            }
+
+    def refresh(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        在当前线程立即执行一次任务并等待完成，例如写入数据之后需要马上读到新结果
+
+        任务正在执行时先等待该次执行结束（它可能早于写入开始），再执行一次。
+
+        Args:
+            name: 任务名
+            timeout: 等待正在执行的那一次的最长秒数
+
+        Returns:
+            是否在当前线程执行了一次；等待超时（或又被其他调用方抢先执行）时为 False
+        """
+        with self._lock:
+            job = self._jobs[name]
+            run_here = self._start(job)
+        if not run_here:
+            job.done.wait(timeout)
+            with self._lock:
+                run_here = self._start(job)
+        if not run_here:
+            logger.warning("刷新 %s 未执行：等待超时或已由其他调用方执行", name)
+            return False
+        self._run(job)
+        return True
+
+    def trigger(self, name: str) -> None:
+        """让任务在下一轮调度时立即刷新，例如写入数据之后"""
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is not None:
+                job.next_run = time.monotonic()
+                self._lock.notify()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各任务的状态
+
+        Returns:
+            {任务名: 包含 interval、runs、age、elapsed、running、error 的字典}
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    'interval': job.interval,
+                    'runs': job.runs,
+                    'age': None if job.completed_at is None else now - job.completed_at,
+                    'elapsed': job.elapsed,
+                    'running': job.running,
+                    'error': job.error,
+                }
+                for name, job in self._jobs.items()
+            }
+
+    def stop(self) -> None:
+        """停止调度线程"""
+        with self._lock:
+            self._stopped = True
+            self._lock.notify()
+        self._executor.shutdown(wait=False)
+
+
+@st.cache_resource
+def get_scheduler():
+    """获取后台刷新调度器单例"""
+    return RefreshScheduler()
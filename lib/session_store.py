@@ -0,0 +1,194 @@
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import streamlit as st
+from pymysql import Error
+
+from lib.db_manager import DatabaseManager, get_db
+
+logger = logging.getLogger(__name__)
+
+# 多进程部署时共享会话的表，只保存会话ID的哈希
+SESSION_TABLE = "sessions"
+
+# 表结构由 lib/migrations.py 的迁移创建
+SESSION_TABLE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {SESSION_TABLE} (
+    session_hash CHAR(64) NOT NULL PRIMARY KEY,
+    username VARCHAR(64) NOT NULL,
+    data TEXT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    KEY idx_sessions_expires_at (expires_at)
+)
+"""
+
+
+class SessionStore:
+    """签名的不透明会话令牌，内存 LRU + 会话表两级解析"""
+
+    def __init__(self, db: DatabaseManager, secret: Optional[str] = None, ttl: float = 86400,
+                 max_entries: int = 10000, persist: bool = True):
+        """
+        初始化会话存储
+
+        Args:
+            db: 数据库管理器
+            secret: 令牌签名密钥；为空时每个进程随机生成，令牌只在本进程内有效，此时不写入会话表
+            ttl: 会话有效秒数
+            max_entries: 内存中缓存的会话数上限
+            persist: 是否写入会话表，供其他进程解析；未配置 secret 时强制为 False
+        """
+        self.db = db
+        self.secret = (secret or secrets.token_hex(32)).encode('utf-8')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if persist and not secret:
+            # 随机密钥在重启或其他进程中不同，写入会话表的会话无法再被校验
+            logger.warning("未配置会话签名密钥，会话只保存在本进程内存中")
+            persist = False
+        self.persist = persist
+
+        self._lock = threading.Lock()
+        # 会话ID哈希 -> (会话数据, 过期时间戳)
+        self._sessions: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.stats = {'issued': 0, 'memory_hits': 0, 'table_hits': 0, 'misses': 0, 'rejected': 0}
+
+    def _sign(self, session_id: str) -> str:
+        """计算会话ID的签名"""
+        return hmac.new(self.secret, session_id.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    @staticmethod
+    def _hash(session_id: str) -> str:
+        """会话ID的哈希，作为存储键，避免令牌明文落库"""
+        return hashlib.sha256(session_id.encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, data: Dict[str, Any], expires_at: float) -> None:
+        """写入内存 LRU"""
+        with self._lock:
+            self._sessions[key] = (data, expires_at)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def issue(self, data: Dict[str, Any]) -> str:
+        """
+        为登录成功的管理员签发会话令牌
+
+        Args:
+            data: 会话数据，至少包含 username；不应包含密码
+
+        Returns:
+            形如 "<会话ID>.<签名>" 的令牌；写入会话表失败时令牌只在本进程内有效
+        """
+        session_id = secrets.token_urlsafe(24)
+        key = self._hash(session_id)
+        expires_at = time.time() + self.ttl
+        self._remember(key, data, expires_at)
+
+        if self.persist:
+            try:
+                self.db.insert(SESSION_TABLE, {
+                    'session_hash': key,
+                    'username': data['username'],
+                    'data': json.dumps(data, default=str, ensure_ascii=False),
+                    'expires_at': datetime.fromtimestamp(expires_at).replace(microsecond=0),
+                })
+            except (Error, ValueError):
+                # 写入失败时会话只在本进程内存中有效，不影响登录
+                logger.exception("写入会话表失败")
+
+        self.stats['issued'] += 1
+        return f"{session_id}.{self._sign(session_id)}"
+
+    def _parse(self, token: Optional[str]) -> Optional[str]:
+        """校验令牌签名，返回会话ID；签名不符时返回 None，不访问数据库"""
+        if not token or '.' not in token:
+            return None
+        session_id, signature = token.rsplit('.', 1)
+        if not hmac.compare_digest(signature, self._sign(session_id)):
+            return None
+        return session_id
+
+    def resolve(self, token: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        解析令牌对应的会话数据
+
+        先查内存 LRU，未命中时查会话表（其他进程签发的会话），都不会访问 admins 表。
+
+        Args:
+            token: issue 返回的令牌
+
+        Returns:
+            会话数据，令牌无效、已过期或会话表查询失败时返回 None
+        """
+        session_id = self._parse(token)
+        if session_id is None:
+            self.stats['rejected'] += 1
+            return None
+        key = self._hash(session_id)
+        now = time.time()
+
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._sessions.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[0]
+                del self._sessions[key]
+
+        if self.persist:
+            try:
+                row = self.db.get_one(SESSION_TABLE, "session_hash = %s AND expires_at > %s",
+                                      (key, datetime.fromtimestamp(now)))
+            except (Error, ValueError):
+                # ValueError: 会话表尚未由迁移创建
+                logger.exception("查询会话表失败")
+                row = None
+            if row:
+                data = json.loads(row['data'])
+                self._remember(key, data, row['expires_at'].timestamp())
+                self.stats['table_hits'] += 1
+                return data
+
+        self.stats['misses'] += 1
+        return None
+
+    def revoke(self, token: Optional[str]) -> None:
+        """
+        注销会话，同时清理会话表中已过期的行
+
+        其他进程内存中已缓存的同一会话不会立即失效。
+
+        Args:
+            token: issue 返回的令牌
+        """
+        session_id = self._parse(token)
+        if session_id is None:
+            return
+        key = self._hash(session_id)
+        with self._lock:
+            self._sessions.pop(key, None)
+        if self.persist:
+            self.db.delete(SESSION_TABLE, "session_hash = %s OR expires_at <= %s",
+                           (key, datetime.now() - timedelta(seconds=1)))
+
+
+@st.cache_resource
+def get_session_store():
+    """获取会话存储单例，密钥和有效期读取 secrets 中的 [session]"""
+    config = st.secrets.get("session", {})
+    return SessionStore(
+        get_db(),
+        secret=config.get("secret"),
+        ttl=config.get("ttl", 86400),
+        persist=config.get("persist", True),
+    )
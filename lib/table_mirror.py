@@ -0,0 +1,155 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from lib.db_manager import DatabaseManager
+
+
+class TableMirror:
+    """进程内的列式表镜像，按 updated_at 水位增量同步"""
+
+    def __init__(self, db: DatabaseManager, table: str, key: str, columns: Tuple[str, ...],
+                 settle_seconds: float = 60, delete_check_interval: float = 60):
+        """
+        初始化表镜像
+
+        Args:
+            db: 数据库管理器
+            table: 表名
+            key: 主键字段
+            columns: 要镜像的字段，主键和 updated_at 会自动加入
+            settle_seconds: 增量同步时水位向前回退的秒数，须大于写入这些表的事务的最长持续时间
+            delete_check_interval: 通过主键集合比对检测删除的间隔秒数
+        """
+        self.db = db
+        self.table = table
+        self.key = key
+        self.columns = list(dict.fromkeys([key, *columns, 'updated_at']))
+        self.settle_seconds = settle_seconds
+        self.delete_check_interval = delete_check_interval
+
+        self._select = f"SELECT {', '.join(self.columns)} FROM {table}"
+        self._lock = threading.Lock()
+        self._frame: Optional[pd.DataFrame] = None
+        self.watermark = None
+        self._delete_checked = 0.0
+        self.stats = {'full_loads': 0, 'incremental_refreshes': 0, 'rows_fetched': 0, 'rows_deleted': 0}
+
+    def _sorted(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """按 (updated_at, 主键) 排序，便于分页和取水位"""
+        return frame.sort_values(['updated_at', self.key], kind='stable', na_position='first').reset_index(drop=True)
+
+    def _set_watermark(self, frame: pd.DataFrame) -> None:
+        """以镜像中最大的 updated_at 作为新水位"""
+        watermark = frame['updated_at'].max() if len(frame) else None
+        if watermark is not None and not pd.isnull(watermark):
+            self.watermark = pd.Timestamp(watermark).to_pydatetime()
+
+    def _full_load(self) -> None:
+        """全量加载"""
+        frame = self._sorted(self.db.execute_df(self._select))
+        self._set_watermark(frame)
+        self._frame = frame
+        self.stats['full_loads'] += 1
+        self.stats['rows_fetched'] += len(frame)
+        self._delete_checked = time.monotonic()
+
+    def _merge_changes(self) -> int:
+        """
+        拉取水位之前 settle_seconds 起变化的行，按主键替换后合并
+
+        updated_at 在语句执行时取值，事务提交可能更晚；提交时其他更晚的行可能已被同步、
+        水位已越过它。回退一段时间重复拉取这些行，按主键替换是幂等的。
+        """
+        since = self.watermark - timedelta(seconds=self.settle_seconds)
+        changed = self.db.execute_df(f"{self._select} WHERE updated_at >= %s", (since,))
+        self.stats['incremental_refreshes'] += 1
+        self.stats['rows_fetched'] += len(changed)
+        if changed.empty:
+            return 0
+
+        frame = self._frame
+        unchanged = frame[~frame[self.key].isin(changed[self.key])]
+        frame = self._sorted(pd.concat([unchanged, changed], ignore_index=True))
+        self._set_watermark(frame)
+        self._frame = frame
+        return len(changed)
+
+    def _drop_deleted(self, batch_size: int = 1000) -> int:
+        """
+        比对主键集合，去掉数据库中已删除的行
+
+        主键集合可能读自落后的副本，其中缺少的主键先在主库上确认，确实不存在才删除，
+        避免去掉已从主库合并进来的新行（它们的 updated_at 已低于水位，不会再被拉回）。
+        """
+        keys = self.db.execute_columnar(f"SELECT {self.key} FROM {self.table}")[self.key]
+        frame = self._frame
+        alive = frame[self.key].isin(keys)
+        missing = frame.loc[~alive, self.key].tolist()
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            found = self.db.execute_columnar(
+                f"SELECT {self.key} FROM {self.table} WHERE {self.key} IN ({', '.join(['%s'] * len(batch))})",
+                tuple(batch), primary=True)[self.key]
+            alive |= frame[self.key].isin(found)
+        deleted = int((~alive).sum())
+        if deleted:
+            self._frame = frame[alive].reset_index(drop=True)
+            self.stats['rows_deleted'] += deleted
+        self._delete_checked = time.monotonic()
+        return deleted
+
+    def refresh(self, full: bool = False) -> None:
+        """
+        同步镜像
+
+        Args:
+            full: 是否全量重新加载
+        """
+        with self._lock:
+            self._refresh(full)
+
+    def sync(self) -> pd.DataFrame:
+        """
+        立即增量同步并返回镜像数据，供后台刷新任务调用
+
+        Returns:
+            按 (updated_at, 主键) 排序的 DataFrame
+        """
+        self.refresh()
+        return self._frame
+
+    def _refresh(self, full: bool = False) -> None:
+        """
+        同步镜像（调用方需持有锁）
+
+        一次同步的所有读在同一个连接上执行，拉取变化和比对主键读到的是同一台服务器的数据。
+        """
+        with self.db.connection_scope(read_only=True):
+            if full or self._frame is None or self.watermark is None:
+                self._full_load()
+            else:
+                self._merge_changes()
+                if time.monotonic() - self._delete_checked >= self.delete_check_interval:
+                    self._drop_deleted()
+
+
+@st.cache_resource
+def get_mirror(_db: DatabaseManager, table: str, key: str, columns: Tuple[str, ...]) -> TableMirror:
+    """
+    获取表镜像单例，同一 (表, 主键, 字段) 组合在进程内共享
+
+    Args:
+        _db: 数据库管理器（不参与缓存键）
+        table: 表名
+        key: 主键字段
+        columns: 要镜像的字段
+
+    Returns:
+        TableMirror 实例
+    """
+    return TableMirror(_db, table, key, columns)
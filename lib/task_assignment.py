@@ -0,0 +1,317 @@
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from lib.scheduler import get_scheduler
+
+# 分配结果表，每个用户的每个浏览器一行
+ASSIGNMENT_TABLE = "task_assignments"
+
+# 后台重新分配的间隔秒数
+ASSIGNMENT_INTERVAL = 60
+
+# 参与分配的任务和用户
+RUNNING_TASKS_SQL = "SELECT task_id, task_group, weight, click_rate FROM tasks WHERE is_run = 1"
+RUNNING_USERS_SQL = "SELECT user_name, task_group, browser_count FROM users WHERE is_running = 1"
+
+# 表结构由 lib/migrations.py 的迁移创建
+ASSIGNMENT_TABLE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {ASSIGNMENT_TABLE} (
+    user_name VARCHAR(64) NOT NULL,
+    browser_index INT NOT NULL,
+    task_id INT NOT NULL,
+    assigned_at DATETIME NOT NULL,
+    PRIMARY KEY (user_name, browser_index)
+)
+"""
+
+
+class AliasTable:
+    """Walker/Vose 别名表，构建 O(n)，每次抽样 O(1)"""
+
+    def __init__(self, weights: np.ndarray):
+        """
+        根据权重构建别名表
+
+        Args:
+            weights: 非负权重数组，至少有一个正数
+        """
+        n = len(weights)
+        scaled = weights.astype('float64') * (n / weights.sum())
+        self.prob = np.ones(n, dtype='float64')
+        self.alias = np.arange(n, dtype='int64')
+
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 剩余项因浮点误差略偏离 1，按 1 处理
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        向量化抽样
+
+        Args:
+            rng: 随机数生成器
+            size: 抽样次数
+
+        Returns:
+            抽中的下标数组
+        """
+        slots = rng.integers(0, len(self.prob), size)
+        accept = rng.random(size) < self.prob[slots]
+        return np.where(accept, slots, self.alias[slots])
+
+
+class TaskAssigner:
+    """按权重为运行中用户的每个浏览器分配同组任务"""
+
+    def __init__(self, db=None, use_click_rate: bool = True, seed: Optional[int] = None):
+        """
+        初始化分配器
+
+        Args:
+            db: 数据库管理器，仅使用 set_tasks/assign 时可为 None
+            use_click_rate: 是否以 weight * click_rate 作为抽样权重，否则只用 weight
+            seed: 随机种子
+        """
+        self.db = db
+        self.use_click_rate = use_click_rate
+        self.rng = np.random.default_rng(seed)
+
+        self._task_ids = np.empty(0, dtype='int64')
+        # task_group -> (起始下标, 结束下标, 权重指纹, 别名表)
+        self._groups: Dict[Any, Tuple[int, int, bytes, AliasTable]] = {}
+        self.stats = {'alias_builds': 0, 'alias_reused': 0}
+
+    def set_tasks(self, task_ids: np.ndarray, task_groups: np.ndarray, weights: np.ndarray) -> None:
+        """
+        载入任务数组，只为权重变化的组重建别名表
+
+        Args:
+            task_ids: 任务ID数组
+            task_groups: 任务组数组
+            weights: 抽样权重数组，非正权重或没有任务组的任务不会被抽中
+        """
+        weights = np.nan_to_num(np.asarray(weights, dtype='float64'))
+        keep = (weights > 0) & ~pd.isnull(task_groups)
+        task_ids, task_groups, weights = task_ids[keep], task_groups[keep], weights[keep]
+
+        # 按组排序后每组是一段连续切片
+        order = np.argsort(task_groups, kind='stable')
+        task_ids, task_groups, weights = task_ids[order], task_groups[order], weights[order]
+        unique_groups, starts = np.unique(task_groups, return_index=True)
+        ends = np.append(starts[1:], len(task_groups))
+
+        groups = {}
+        for group, start, end in zip(unique_groups.tolist(), starts, ends):
+            signature = task_ids[start:end].tobytes() + weights[start:end].tobytes()
+            previous = self._groups.get(group)
+            if previous is not None and previous[2] == signature:
+                table = previous[3]
+                self.stats['alias_reused'] += 1
+            else:
+                table = AliasTable(weights[start:end])
+                self.stats['alias_builds'] += 1
+            groups[group] = (int(start), int(end), signature, table)
+
+        self._task_ids = task_ids
+        self._groups = groups
+
+    def load_tasks(self) -> int:
+        """
+        从数据库载入运行中的任务
+
+        Returns:
+            可分配的任务数
+        """
+        columns = self.db.execute_columnar(RUNNING_TASKS_SQL)
+        weights = columns['weight'].astype('float64')
+        if self.use_click_rate:
+            weights = weights * columns['click_rate'].astype('float64')
+        self.set_tasks(columns['task_id'], columns['task_group'], weights)
+        return len(self._task_ids)
+
+    def assign(self, user_names: np.ndarray, user_groups: np.ndarray,
+               browser_counts: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        一次性为所有用户的所有浏览器抽取任务
+
+        Args:
+            user_names: 用户名数组
+            user_groups: 用户所属任务组数组
+            browser_counts: 每个用户的浏览器数量数组
+
+        Returns:
+            {'user_name', 'browser_index', 'task_id'} 三个等长数组；
+            没有任务组或所在组没有可用任务的浏览器不出现在结果中
+        """
+        counts = np.nan_to_num(np.asarray(browser_counts, dtype='float64')).astype('int64').clip(min=0)
+        # 没有任务组的用户不参与分配
+        counts[pd.isnull(user_groups)] = 0
+        draw_users = np.repeat(np.arange(len(user_names)), counts)
+        # 每个用户内浏览器的序号：全局序号减去该用户的起始位置
+        offsets = np.repeat(np.cumsum(counts) - counts, counts)
+        browser_index = np.arange(len(draw_users)) - offsets
+
+        draw_groups = np.asarray(user_groups)[draw_users]
+        task_ids = np.full(len(draw_users), -1, dtype=self._task_ids.dtype if len(self._task_ids) else 'int64')
+        if len(draw_users):
+            unique_groups, inverse = np.unique(draw_groups, return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.append(0, np.cumsum(np.bincount(inverse, minlength=len(unique_groups))))
+            for i, group in enumerate(unique_groups.tolist()):
+                entry = self._groups.get(group)
+                if entry is None:
+                    continue
+                start, end, _, table = entry
+                positions = order[bounds[i]:bounds[i + 1]]
+                task_ids[positions] = self._task_ids[start:end][table.sample(self.rng, len(positions))]
+
+        assigned = task_ids != -1
+        return {
+            'user_name': np.asarray(user_names)[draw_users[assigned]],
+            'browser_index': browser_index[assigned],
+            'task_id': task_ids[assigned],
+        }
+
+    def load_users(self) -> Dict[str, np.ndarray]:
+        """从数据库载入运行中的用户"""
+        return self.db.execute_columnar(RUNNING_USERS_SQL)
+
+    def write_assignments(self, assignments: Dict[str, np.ndarray], batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        批量写回分配结果，并删除本次没有写到的行
+
+        用户停止运行或浏览器数减少后，其多出的行不会再被覆盖；写入和删除在同一事务中，
+        读取方看到的始终是某一次完整的分配。assigned_at 只精确到秒，本次的时间戳
+        取严格大于表中已有的最大值，同一秒内的两次分配也能区分。
+
+        Args:
+            assignments: assign 返回的数组字典
+            batch_size: 每批行数
+
+        Returns:
+            upsert_many 的统计字典，另含 deleted（删除的行数）
+        """
+        with self.db.transaction():
+            latest = self.db.execute(f"SELECT MAX(assigned_at) AS latest FROM {ASSIGNMENT_TABLE} FOR UPDATE")
+            assigned_at = datetime.now().replace(microsecond=0)
+            if latest and latest[0]['latest'] is not None and latest[0]['latest'] >= assigned_at:
+                assigned_at = latest[0]['latest'] + timedelta(seconds=1)
+            rows = [
+                {'user_name': user_name, 'browser_index': browser_index, 'task_id': task_id,
+                 'assigned_at': assigned_at}
+                for user_name, browser_index, task_id in zip(
+                    assignments['user_name'].tolist(),
+                    assignments['browser_index'].tolist(),
+                    assignments['task_id'].tolist(),
+                )
+            ]
+            result = self.db.upsert_many(ASSIGNMENT_TABLE, rows, ['task_id', 'assigned_at'], batch_size)
+            result['deleted'] = self.db.delete(ASSIGNMENT_TABLE, "assigned_at < %s", (assigned_at,))
+        return result
+
+    def run(self) -> Dict[str, Any]:
+        """
+        载入任务和用户、分配并写回
+
+        Returns:
+            包含分配数、耗时及写入统计的字典
+        """
+        start = time.perf_counter()
+        self.load_tasks()
+        users = self.load_users()
+        assignments = self.assign(users['user_name'], users['task_group'], users['browser_count'])
+        elapsed = time.perf_counter() - start
+        write = self.write_assignments(assignments)
+        return {
+            'assignments': len(assignments['task_id']),
+            'assign_elapsed': elapsed,
+            'write': write,
+        }
+
+
+@st.cache_resource
+def get_assigner(_db) -> TaskAssigner:
+    """
+    获取任务分配器单例，复用各组的别名表
+
+    Args:
+        _db: 数据库管理器（不参与缓存键）
+    """
+    return TaskAssigner(_db)
+
+
+def register_assignment_job(db) -> None:
+    """
+    注册后台任务分配任务（已注册时不做任何事），每 ASSIGNMENT_INTERVAL 秒重新分配一次
+
+    在应用启动时调用；分配结果写入 task_assignments，由各浏览器客户端读取。
+    """
+    get_scheduler().register("task_assignment", get_assigner(db).run, ASSIGNMENT_INTERVAL)
+
+
+def benchmark(n_tasks: int = 10000, n_groups: int = 50, n_users: int = 20000, max_browsers: int = 10,
+              rounds: int = 5, seed: int = 0) -> Dict[str, float]:
+    """
+    用合成数据测量分配吞吐量（不访问数据库）
+
+    Args:
+        n_tasks: 任务数
+        n_groups: 任务组数
+        n_users: 运行中用户数
+        max_browsers: 每个用户最多浏览器数
+        rounds: 分配轮数
+        seed: 随机种子
+
+    Returns:
+        包含 assignments_per_sec、首次建表耗时等指标的字典
+    """
+    rng = np.random.default_rng(seed)
+    task_ids = np.arange(1, n_tasks + 1)
+    task_groups = rng.integers(0, n_groups, n_tasks)
+    weights = rng.random(n_tasks) * rng.random(n_tasks)
+    user_names = np.array([f"user_{i}" for i in range(n_users)], dtype=object)
+    user_groups = rng.integers(0, n_groups, n_users)
+    browser_counts = rng.integers(1, max_browsers + 1, n_users)
+
+    assigner = TaskAssigner(seed=seed)
+    start = time.perf_counter()
+    assigner.set_tasks(task_ids, task_groups, weights)
+    build_time = time.perf_counter() - start
+
+    # 权重未变时再次载入应复用别名表
+    start = time.perf_counter()
+    assigner.set_tasks(task_ids, task_groups, weights)
+    reload_time = time.perf_counter() - start
+
+    total = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        total += len(assigner.assign(user_names, user_groups, browser_counts)['task_id'])
+    elapsed = time.perf_counter() - start
+
+    return {
+        'assignments': total,
+        'elapsed': elapsed,
+        'assignments_per_sec': total / elapsed if elapsed > 0 else 0.0,
+        'alias_build_s': build_time,
+        'alias_reload_s': reload_time,
+    }
+
+
+if __name__ == '__main__':
+    result = benchmark()
+    print(f"分配 {result['assignments']} 次，耗时 {result['elapsed']:.3f}s，"
+          f"{result['assignments_per_sec']:,.0f} 次/秒；"
+          f"首次建表 {result['alias_build_s'] * 1000:.1f}ms，复用载入 {result['alias_reload_s'] * 1000:.1f}ms")
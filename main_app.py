@@ -4,6 +4,8 @@ import streamlit as st
 from components import init_session_state
 from components.login_form import login_form, is_logged_in, logout
 from lib import get_db
+from lib.query_stats import set_page
+from lib.task_assignment import register_assignment_job
 
 # 这必须是第一个 Streamlit 命令
 st.set_page_config(layout="wide")
@@ -11,6 +13,9 @@ st.set_page_config(layout="wide")
 # 获取数据库管理器
 db = get_db()
 
+# 后台定期为运行中用户的浏览器分配任务，与是否有人登录无关
+register_assignment_job(db)
+
 # 初始化 session state
 init_session_state()
 
@@ -23,6 +28,8 @@ if is_logged_in():
 
     # 显示当前页面内容
     page = st.session_state.get('current_page', 'dashboard')
+    # 记录当前页面，供查询统计区分来源
+    set_page(page)
     if page == 'dashboard':
         from pages.dashboard import show_dashboard
         show_dashboard()
@@ -35,8 +42,15 @@ if is_logged_in():
     elif page == 'settings':
         from pages.settings import show_settings
         show_settings()
+    elif page == 'movies':
+        from pages.movies import show_movies
+        show_movies()
+    elif page == 'diagnostics':
+        from pages.diagnostics import show_diagnostics
+        show_diagnostics()
     elif page == 'logout':
         logout()
 else:
     # 显示登录界面
+    set_page('login')
     login_form()
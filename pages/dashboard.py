@@ -1,5 +1,11 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
 import streamlit as st
-from lib import get_db
+from lib.db_manager import get_db
+from lib.metrics import get_metrics
+from pages.task_data import get_task_result
+from pages.user_manage import get_user_result
 
 def show_dashboard():
     """显示仪表板页面"""
@@ -16,19 +22,51 @@ def show_dashboard():
         with col2:
             st.subheader("系统状态")
 
-            # 获取系统统计信息
+            # 由后台同步的表镜像计算，不访问数据库
             try:
-                db = get_db()
-
-                user_count = db.count("users")
-                active_users = db.count("users", 'is_running = 1')
+                snapshot = get_dashboard_snapshot()
+                users = snapshot['users']
+                tasks = snapshot['tasks']
 
-                st.metric("总用户数", user_count)
-                st.metric("活跃用户", active_users)
-                st.metric("今日访问", "243")
+                metric_col1, metric_col2 = st.columns(2)
+                with metric_col1:
+                    st.metric("总用户数", users['total'])
+                    st.metric("活跃用户", users['active'])
+                    st.metric("今日更新用户", users['updated_today'])
+                with metric_col2:
+                    st.metric("总任务数", tasks['total'])
+                    st.metric("运行任务", tasks['active'])
+                    st.metric("今日更新任务", tasks['updated_today'])
+                st.caption(f"统计时间: {snapshot['refreshed_at']:%Y-%m-%d %H:%M:%S}")
             except Exception as e:
                 st.error(f"获取统计信息失败: {e}")
+                snapshot = None
 
     # 其他仪表板内容...
-    st.subheader("最近活动")
-    # 这里可以显示最近的活动记录
\ No newline at end of file
+    st.subheader("任务组概况")
+    if st.session_state.user_info and snapshot:
+        groups = sorted(set(snapshot['users']['groups']) | set(snapshot['tasks']['groups']), key=str)
+        st.dataframe(pd.DataFrame({
+            '任务组': [str(group) for group in groups],
+            '用户数': [snapshot['users']['groups'].get(group, {}).get('total', 0) for group in groups],
+            '活跃用户': [snapshot['users']['groups'].get(group, {}).get('active', 0) for group in groups],
+            '任务数': [snapshot['tasks']['groups'].get(group, {}).get('total', 0) for group in groups],
+            '运行任务': [snapshot['tasks']['groups'].get(group, {}).get('active', 0) for group in groups],
+        }), hide_index=True, use_container_width=True)
+
+
+def get_dashboard_snapshot():
+    """由任务和用户列表的镜像计算仪表板指标，失败且没有旧结果时抛出异常"""
+    db = get_db()
+    results = {'users': get_user_result(db), 'tasks': get_task_result(db)}
+    for result in results.values():
+        if result['value'] is None:
+            raise RuntimeError(result['error'] or "统计信息尚未加载")
+
+    metrics = get_metrics()
+    age = max(result['age'] or 0 for result in results.values())
+    return {
+        'users': metrics.counts('users', results['users']['value'], 'is_running'),
+        'tasks': metrics.counts('tasks', results['tasks']['value'], 'is_run'),
+        'refreshed_at': datetime.now() - timedelta(seconds=age),
+    }
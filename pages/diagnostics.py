@@ -0,0 +1,128 @@
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from lib import get_db
+from lib.migrations import HOT_QUERIES, QueryPlanError, check_hot_queries, get_migrator
+from lib.query_stats import LATENCY_BUCKETS_MS
+from lib.scheduler import get_scheduler
+
+
+def show_diagnostics():
+    """显示性能诊断页面"""
+    st.title("性能诊断")
+    db = get_db()
+
+    # 连接池与缓存状态
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("连接池")
+        pool = db.pool_stats()
+        liveness = db.liveness_stats()
+        metric_col1, metric_col2, metric_col3 = st.columns(3)
+        metric_col1.metric("使用中", f"{pool['in_use']} / {pool['max_size']}")
+        metric_col2.metric("空闲", pool['idle'])
+        metric_col3.metric("平均等待", f"{pool['wait_time_avg'] * 1000:.1f} ms")
+        st.json({**pool, **liveness}, expanded=False)
+
+    with col2:
+        st.subheader("查询缓存")
+        cache = db.cache_stats()
+        metric_col1, metric_col2, metric_col3 = st.columns(3)
+        metric_col1.metric("命中率", f"{cache['hit_rate']:.1%}")
+        metric_col2.metric("条目", cache['entries'])
+        metric_col3.metric("缓存行数", cache['rows'])
+        st.json({**cache, 'statements': db.statements.stats()}, expanded=False)
+
+    # 读写路由
+    routing = db.routing_stats()
+    if routing['replicas']:
+        st.subheader("读写路由")
+        metric_col1, metric_col2, metric_col3 = st.columns(3)
+        metric_col1.metric("副本读", routing['replica_reads'])
+        metric_col2.metric("主库读", routing['primary_reads'])
+        metric_col3.metric("读己之写", routing['sticky_reads'])
+        st.dataframe(pd.DataFrame(routing['replica_pools']), use_container_width=True)
+
+    # 结构迁移与热点查询的执行计划
+    st.subheader("数据库结构")
+    show_schema_status(db)
+
+    # 后台刷新任务
+    st.subheader("后台刷新")
+    jobs = get_scheduler().stats()
+    if jobs:
+        st.dataframe(pd.DataFrame.from_dict(jobs, orient='index'), use_container_width=True)
+    else:
+        st.info("暂无后台刷新任务")
+
+    # 按指纹汇总的查询延迟
+    st.subheader("查询延迟")
+    summary = db.query_stats.summary()
+    if summary:
+        table = pd.DataFrame(summary).drop(columns=['histogram'])
+        st.dataframe(
+            table.round({'total_s': 3, 'p50_ms': 1, 'p95_ms': 1, 'p99_ms': 1, 'max_ms': 1,
+                         'avg_rows': 1, 'avg_bytes': 0}),
+            use_container_width=True,
+        )
+
+        selected = st.selectbox("延迟分布", range(len(summary)),
+                                format_func=lambda i: summary[i]['fingerprint'][:120])
+        labels = [f"≤{bound:g}ms" if bound != float('inf') else f">{LATENCY_BUCKETS_MS[-2]:g}ms"
+                  for bound in LATENCY_BUCKETS_MS]
+        st.bar_chart(pd.Series(summary[selected]['histogram'], index=labels))
+    else:
+        st.info("暂无查询记录")
+
+    # 慢查询日志
+    st.subheader(f"慢查询（≥ {db.query_stats.slow_threshold:g}s）")
+    slow = db.query_stats.slow_queries()
+    if not slow:
+        st.info("暂无慢查询")
+    for i, entry in enumerate(slow):
+        when = datetime.fromtimestamp(entry['time']).strftime("%Y-%m-%d %H:%M:%S")
+        with st.expander(f"{when}  {entry['elapsed']:.3f}s  [{entry['page']}]  {entry['fingerprint'][:80]}"):
+            st.code(entry['query'], language="sql")
+            if st.button("查看执行计划", key=f"explain_{i}"):
+                try:
+                    st.dataframe(db.explain(entry['query']), use_container_width=True)
+                except Exception as e:
+                    st.error(f"获取执行计划失败: {e}")
+
+    if st.button("清空统计"):
+        db.query_stats.reset()
+        st.rerun()
+
+
+def show_schema_status(db):
+    """显示迁移执行情况，提供执行迁移和检查热点查询执行计划的按钮"""
+    migrator = get_migrator()
+    migrate_col, check_col = st.columns(2)
+    with migrate_col:
+        if st.button("执行迁移"):
+            try:
+                executed = migrator.migrate()
+                st.success(f"已执行迁移 {executed}" if executed else "没有待执行的迁移")
+            except Exception as e:
+                st.error(f"执行迁移失败: {e}")
+    with check_col:
+        if st.button("检查热点查询"):
+            try:
+                results = check_hot_queries(db)
+                st.success(f"{len(HOT_QUERIES)} 个热点查询均未全表扫描")
+                st.dataframe(pd.DataFrame(results), use_container_width=True)
+            except QueryPlanError as e:
+                st.error(f"热点查询执行计划退化为全表扫描: {e}")
+                st.dataframe(pd.DataFrame(e.failures), use_container_width=True)
+            except Exception as e:
+                st.error(f"检查执行计划失败: {e}")
+
+    try:
+        status = pd.DataFrame(migrator.status())
+    except Exception as e:
+        st.error(f"读取迁移记录失败: {e}")
+        return
+    pending = int(status['applied_at'].isna().sum())
+    if pending:
+        st.warning(f"{pending} 个迁移尚未执行")
+    st.dataframe(status, use_container_width=True)
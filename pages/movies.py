@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from lib.datasets import get_datasets
+
+MOVIES_DATASET = "movie_metadata"
+
+# 明细表展示的字段和最多行数
+MOVIE_TABLE_COLUMNS = ["movie_title", "title_year", "genres", "imdb_score", "gross", "budget", "director_name"]
+MOVIE_TABLE_LIMIT = 200
+
+# 评分直方图的桶
+SCORE_BINS = np.arange(0, 10.5, 0.5)
+
+
+def show_movies():
+    """显示电影数据浏览页面"""
+    st.title("电影数据")
+
+    datasets = get_datasets()
+    index = get_movie_index(datasets.signature(MOVIES_DATASET))
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        genres = st.multiselect("类型", index['genre_names'], help="包含任一所选类型的电影")
+    with col2:
+        year_range = st.slider("年份", index['year_min'], index['year_max'],
+                               (index['year_min'], index['year_max']))
+    with col3:
+        score_range = st.slider("IMDb 评分", 0.0, 10.0, (0.0, 10.0), step=0.1)
+
+    mask = movie_mask(index, genres, year_range, score_range)
+    st.caption(f"匹配 {int(mask.sum())} / {len(mask)} 部电影，"
+               f"数据集加载 {datasets.stats['last_load_s'] * 1000:.1f} ms（CSV 转换 {datasets.stats['csv_conversions']} 次）")
+
+    st.subheader("按类型汇总")
+    st.dataframe(genre_summary(index, mask), use_container_width=True)
+
+    year_col, score_col = st.columns(2)
+    with year_col:
+        st.subheader("按年份")
+        st.line_chart(year_summary(index, mask)[['movies', 'avg_score']])
+    with score_col:
+        st.subheader("评分分布")
+        counts, _ = np.histogram(index['score'][mask & ~np.isnan(index['score'])], bins=SCORE_BINS)
+        st.bar_chart(pd.Series(counts, index=[f"{b:.1f}" for b in SCORE_BINS[:-1]]))
+
+    st.subheader("评分最高的电影")
+    st.dataframe(top_movies(index, mask), use_container_width=True)
+
+
+@st.cache_resource
+def get_movie_index(signature):
+    """
+    从内存映射的电影表构建向量化查询所需的数组，源文件变化时重建
+
+    Args:
+        signature: 数据集源文件签名，作为缓存键
+
+    Returns:
+        包含 table、year、score、gross、类型展开数组等的字典
+    """
+    import pyarrow.compute as pc
+
+    table = get_datasets().load(MOVIES_DATASET)
+    # 把 "Action|Adventure" 展开为 (电影行号, 类型编码) 两个等长数组
+    genre_lists = pc.split_pattern(pc.fill_null(table.column('genres'), ''), '|').combine_chunks()
+    parents = pc.list_parent_indices(genre_lists).to_numpy()
+    encoded = pc.list_flatten(genre_lists).dictionary_encode()
+    names = encoded.dictionary.to_pylist()
+    codes = encoded.indices.to_numpy()
+    keep = np.array([bool(name) for name in names])[codes]
+
+    year = table.column('title_year').to_numpy().astype('float64')
+    valid_years = year[~np.isnan(year)]
+    return {
+        'table': table,
+        'year': year,
+        'score': table.column('imdb_score').to_numpy().astype('float64'),
+        'gross': table.column('gross').to_numpy().astype('float64'),
+        'genre_parents': parents[keep],
+        'genre_codes': codes[keep],
+        'genre_names_by_code': names,
+        'genre_names': sorted(name for name in names if name),
+        'year_min': int(valid_years.min()),
+        'year_max': int(valid_years.max()),
+    }
+
+
+def movie_mask(index, genres, year_range, score_range):
+    """
+    计算筛选条件的布尔掩码
+
+    Args:
+        index: get_movie_index 的结果
+        genres: 所选类型，为空表示不过滤
+        year_range: (起始年份, 结束年份)，均包含
+        score_range: (最低分, 最高分)，均包含
+
+    Returns:
+        与电影表等长的布尔数组
+    """
+    year, score = index['year'], index['score']
+    with np.errstate(invalid='ignore'):
+        mask = (year >= year_range[0]) & (year <= year_range[1]) \
+            & (score >= score_range[0]) & (score <= score_range[1])
+    if genres:
+        names = index['genre_names_by_code']
+        selected = np.isin(index['genre_codes'], [names.index(genre) for genre in genres])
+        has_genre = np.zeros(len(year), dtype=bool)
+        has_genre[index['genre_parents'][selected]] = True
+        mask &= has_genre
+    return mask
+
+
+def genre_summary(index, mask):
+    """按类型统计电影数、平均评分和总票房，一部电影计入它的每个类型"""
+    parents, codes = index['genre_parents'], index['genre_codes']
+    keep = mask[parents]
+    parents, codes = parents[keep], codes[keep]
+    size = len(index['genre_names_by_code'])
+
+    score, gross = index['score'][parents], index['gross'][parents]
+    scored, grossed = ~np.isnan(score), ~np.isnan(gross)
+    movies = np.bincount(codes, minlength=size)
+    score_count = np.bincount(codes[scored], minlength=size)
+    score_sum = np.bincount(codes[scored], weights=score[scored], minlength=size)
+    gross_sum = np.bincount(codes[grossed], weights=gross[grossed], minlength=size)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary = pd.DataFrame({
+            'genre': index['genre_names_by_code'],
+            'movies': movies,
+            'avg_score': np.round(score_sum / score_count, 2),
+            'total_gross': gross_sum,
+        })
+    summary = summary[(summary['genre'] != '') & (summary['movies'] > 0)]
+    return summary.sort_values('movies', ascending=False).reset_index(drop=True)
+
+
+def year_summary(index, mask):
+    """按年份统计电影数和平均评分"""
+    year, score = index['year'], index['score']
+    mask = mask & ~np.isnan(year)
+    years, inverse = np.unique(year[mask].astype('int64'), return_inverse=True)
+    selected = score[mask]
+    scored = ~np.isnan(selected)
+    movies = np.bincount(inverse, minlength=len(years))
+    score_count = np.bincount(inverse[scored], minlength=len(years))
+    score_sum = np.bincount(inverse[scored], weights=selected[scored], minlength=len(years))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({'movies': movies, 'avg_score': score_sum / score_count}, index=years)
+
+
+def top_movies(index, mask, limit=MOVIE_TABLE_LIMIT):
+    """取评分最高的若干部电影，只把这些行从映射表转换为 DataFrame"""
+    rows = np.flatnonzero(mask)
+    score = index['score'][rows]
+    order = np.argsort(np.where(np.isnan(score), -np.inf, -score), kind='stable')[:limit]
+    return index['table'].take(rows[order]).select(MOVIE_TABLE_COLUMNS).to_pandas()
@@ -1,7 +1,35 @@
 from datetime import date, timedelta
+import pandas as pd
 import streamlit as st
+from components import edit_grid, export_button
 from lib import get_db
-from pages.user_manage import get_user_info
+from lib.rollups import activity_range, get_rollup
+from lib.scheduler import get_scheduler
+from lib.table_mirror import get_mirror
+from pages.user_manage import LIST_CACHE_TTL, get_user_info, register_user_job
+
+
+# 每页行数选项
+PAGE_SIZE_OPTIONS = [50, 100, 200, 500]
+
+# 列表页镜像的窄字段（task_id 和 updated_at 自动加入），宽字段在选中行后按需加载
+TASK_LIST_COLUMNS = ("is_run", "task_name", "channel", "task_group", "weight", "click_rate")
+
+# 按需加载的宽字段
+TASK_DETAIL_COLUMNS = ["task_urls"]
+
+# 任务列表后台刷新的间隔秒数
+TASK_REFRESH_INTERVAL = 10
+
+# 编辑模式下可修改的字段
+TASK_EDITABLE_COLUMNS = ("is_run", "weight")
+
+# 导出完整任务列表（含宽字段），后接筛选条件
+TASK_EXPORT_SQL = (f"SELECT task_id, {', '.join(TASK_LIST_COLUMNS + tuple(TASK_DETAIL_COLUMNS))}, updated_at "
+                   f"FROM tasks")
+
+# 活动汇总表增量刷新的间隔秒数
+ACTIVITY_REFRESH_INTERVAL = 60
 
 
 def show_task_data():
@@ -10,22 +38,24 @@ def show_task_data():
     st.title("任务管理")
     db = get_db()
 
-    # 取出任务数据
-    tasks = get_task_info(db)
+    # 先注册两个互不依赖的刷新任务，首次加载时任务和用户并发查询，
+    # 页面只等待较慢的那一个
+    register_task_job(db)
+    register_user_job(db)
 
-    # 取出用户数据
-    users = get_user_info(db)
+    # 下拉框只需要任务ID和用户名，不再拉取整张表
+    task_id_list = get_task_ids(db)
+    task_id_list.insert(0, "All_Task")
+
+    user_list = get_user_names(db)
+    user_list.insert(0, "All_User")
 
-    # 创建两列布局
+    # 创建三列布局
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        # 创建一个日期范围选择器
         st.subheader("选择任务ID")
 
-        task_id_list = [task['task_id'] for task in tasks]
-        task_id_list.insert(0, "All_Task")
-
         # 创建一个任务ID下拉选择框
         selected_task = st.selectbox(
             label="选择任务ID",  # 选择框的标签
@@ -38,13 +68,10 @@ def show_task_data():
         # 用户选择
         st.subheader("选择用户")
 
-        user_list = [user['user_name'] for user in users]
-        user_list.insert(0, "All_User")
-
-        # 创建一个任务ID下拉选择框
-        selected_task = st.selectbox(
+        # 创建一个用户下拉选择框
+        selected_user = st.selectbox(
             label="选择用户",  # 选择框的标签
-            options=task_id_list,  # 下拉选项列表
+            options=user_list,  # 下拉选项列表
             index=0,  # 默认选中第一个选项
             help="请选择一个用户"  # 帮助文本
         )
@@ -75,33 +102,299 @@ def show_task_data():
                 help="请选择结束日期"
             )
 
-    # 可以根据选择执行一些操作
-    if st.button("查询数据", type="primary"):
-        # 这里可以添加查询数据库的代码
-        with st.spinner("正在查询数据..."):
-            st.write(start_date)
-            st.write(end_date)
-            st.write(selected_task)
-            # 模拟数据库查询
-            st.success("查询完成!")
+    filters = {
+        'task_id': None if selected_task == "All_Task" else selected_task,
+        'user_name': None if selected_user == "All_User" else selected_user,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
 
+    # 任务列表
+    st.subheader("任务列表")
+    size_col, edit_col = st.columns([1, 3])
+    with size_col:
+        page_size = st.selectbox("每页行数", PAGE_SIZE_OPTIONS, index=1)
+    with edit_col:
+        edit_mode = st.toggle("编辑模式", key="task_edit_mode")
 
+    # 筛选条件或每页行数变化时回到第一页
+    state_key = (tuple(filters.items()), page_size)
+    if st.session_state.get('task_page_state_key') != state_key:
+        st.session_state.task_page_state_key = state_key
+        st.session_state.task_page_cursor = (None, None)
 
+    after, before = st.session_state.task_page_cursor
+    tasks, has_more = get_task_page(db, filters, page_size, after=after, before=before)
 
-    # 任务列表
-    st.subheader("任务列表")
-    st.dataframe(tasks, height=800)
-    # # 可以根据选择执行一些操作
-    # if st.button("任务列表", type="primary"):
-    #     # 这里可以添加查询数据库的代码
-    #     with st.spinner("正在查询数据..."):
-    #         st.dataframe(tasks, height=800)
-    #         st.success("查询完成!")
+    # 向后翻页时 has_more 表示还有下一页，向前翻页时表示还有上一页
+    has_prev = has_more if before is not None else after is not None
+    has_next = has_more if before is None else True
+
+    if edit_mode and not tasks.empty:
+        # 编辑位置相对于当前页，每页使用独立的编辑状态
+        edit_grid(db, "tasks", "task_id", tasks.assign(is_run=tasks['is_run'].fillna(0).astype(bool)),
+                  TASK_EDITABLE_COLUMNS, key=f"task_editor_{hash(st.session_state.task_page_cursor)}",
+                  refresh_job="tasks")
+        event = None
+    else:
+        event = st.dataframe(tasks, height=800, on_select="rerun", selection_mode="multi-row",
+                             key="task_list")
+
+    prev_col, info_col, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        if st.button("上一页", disabled=not has_prev or tasks.empty, use_container_width=True):
+            st.session_state.task_page_cursor = (None, page_key(tasks, 0))
+            st.rerun()
+    with info_col:
+        st.caption(f"本页 {len(tasks)} 条，数据更新于 {get_task_result(db)['age'] or 0:.0f} 秒前")
+    with next_col:
+        if st.button("下一页", disabled=not has_next or tasks.empty, use_container_width=True):
+            st.session_state.task_page_cursor = (page_key(tasks, -1), None)
+            st.rerun()
+
+    # 按当前筛选条件导出完整任务列表（含宽字段）
+    with st.expander("导出任务列表"):
+        where, params = build_task_filter(filters)
+        export_button(db, "tasks", f"{TASK_EXPORT_SQL}{where} ORDER BY updated_at, task_id", params, key="task_export")
+
+    # 日期范围内的任务活动
+    show_task_activity(db, filters)
+
+    # 选中行的宽字段详情
+    # 翻页后旧的选中位置可能越界
+    selected_rows = [i for i in (event.selection.rows if event else []) if i < len(tasks)]
+    if selected_rows:
+        st.subheader("任务详情")
+        task_ids = [tasks['task_id'].iloc[i] for i in selected_rows]
+        task_ids = [task_id.item() if hasattr(task_id, 'item') else task_id for task_id in task_ids]
+        details = get_task_details(db, task_ids)
+        for task_id in task_ids:
+            detail = details.get(task_id)
+            with st.expander(f"任务 {task_id}", expanded=len(task_ids) == 1):
+                if detail is None:
+                    st.info("任务不存在或已被删除")
+                    continue
+                for column in TASK_DETAIL_COLUMNS:
+                    st.text_area(column, detail[column] or "", height=150, disabled=True,
+                                 key=f"task_detail_{task_id}_{column}")
+
+
+def show_task_activity(db, filters):
+    """按日期范围显示任务的运行、点击次数，以及实际点击率与设定 click_rate 的对比"""
+    st.subheader("任务活动")
+    register_activity_job()
+    activity = get_task_activity(db, filters)
+    if activity is None:
+        return
+    by_day, by_task = activity['day'], activity['task']
+    if by_task.empty:
+        st.info("所选日期范围内没有任务活动")
+        return
+
+    st.line_chart(by_day.set_index('day')[['runs', 'clicks']])
+
+    tasks = get_task_list(db)[['task_id', 'task_name', 'click_rate']]
+    summary = by_task.merge(tasks, on='task_id', how='left')
+    runs = summary['runs'].astype(float)
+    summary['realized_rate'] = (summary['clicks'].astype(float) / runs.where(runs > 0)).round(4)
+    summary['rate_gap'] = (summary['realized_rate'] - summary['click_rate'].astype(float)).round(4)
+    st.dataframe(summary[['task_id', 'task_name', 'runs', 'clicks', 'realized_rate', 'click_rate', 'rate_gap']],
+                 use_container_width=True)
+
+
+def register_activity_job():
+    """注册活动汇总表的后台增量刷新任务（已注册时不做任何事）"""
+    get_scheduler().register("task_activity", get_rollup().refresh, ACTIVITY_REFRESH_INTERVAL)
+
+
+def get_task_activity(db, filters):
+    """
+    并发查询日期范围内按天和按任务汇总的活动
+
+    Args:
+        db: 数据库管理器
+        filters: 页面筛选条件，见 filter_tasks；任务和用户条件先在镜像上换算为任务ID
+
+    Returns:
+        {'day': 按天汇总的 DataFrame, 'task': 按任务汇总的 DataFrame}，失败时返回 None
+    """
+    try:
+        task_ids = None
+        if filters.get('task_id') is not None or filters.get('user_name') is not None:
+            tasks = get_task_list(db)
+            mask = filter_tasks(db, tasks, {'task_id': filters.get('task_id'),
+                                            'user_name': filters.get('user_name')})
+            task_ids = [int(task_id) for task_id in tasks.loc[mask, 'task_id']]
+        rollup = get_rollup()
+        start, end = activity_range(filters['start_date'], filters['end_date'])
+        results, _ = db.execute_concurrent(
+            {by: rollup.build_query(start, end, by, task_ids) for by in ('day', 'task')},
+            result='df', cache_ttl=LIST_CACHE_TTL)
+        return results
+    except Exception as e:
+        st.error(f"获取任务活动失败: {e}")
+        return None
 
 
-def get_task_info(db):
+def get_task_details(db, task_ids):
+    """
+    批量获取任务的宽字段，已加载过的任务直接读行缓存
+
+    Args:
+        db: 数据库管理器
+        task_ids: 任务ID列表
+
+    Returns:
+        {task_id: 详情字典}
+    """
     try:
-        sql = "select task_id, is_run, task_name, channel, task_group, weight, click_rate, tasks.task_urls, updated_at from tasks"
-        return db.execute(sql)
+        return db.get_by_keys("tasks", "task_id", task_ids, TASK_DETAIL_COLUMNS)
     except Exception as e:
-        st.error(f"获取任务列表失败: {e}")
\ No newline at end of file
+        st.error(f"获取任务详情失败: {e}")
+        return {}
+
+
+def get_task_mirror(db):
+    """获取任务列表的进程内镜像"""
+    return get_mirror(db, "tasks", "task_id", TASK_LIST_COLUMNS)
+
+
+def register_task_job(db):
+    """注册任务列表的后台刷新任务（已注册时不做任何事）"""
+    get_scheduler().register("tasks", get_task_mirror(db).sync, TASK_REFRESH_INTERVAL)
+
+
+def get_task_result(db):
+    """读取后台刷新的任务列表结果，首次调用时注册刷新任务"""
+    register_task_job(db)
+    return get_scheduler().get("tasks")
+
+
+def get_task_list(db):
+    """获取最近一次刷新完成的任务列表，失败且没有旧结果时抛出异常"""
+    result = get_task_result(db)
+    if result['value'] is None:
+        raise RuntimeError(result['error'] or "任务列表尚未加载")
+    return result['value']
+
+
+def get_task_ids(db):
+    """获取全部任务ID，用于下拉选择"""
+    try:
+        return sorted(get_task_list(db)['task_id'].tolist())
+    except Exception as e:
+        st.error(f"获取任务ID失败: {e}")
+        return []
+
+
+def get_user_names(db):
+    """获取全部用户名，用于下拉选择"""
+    users = get_user_info(db)
+    return [] if users is None else sorted(users['user_name'].tolist())
+
+
+def filter_tasks(db, tasks, filters):
+    """
+    在镜像上计算页面筛选条件的布尔掩码
+
+    Args:
+        db: 数据库管理器
+        tasks: 任务镜像 DataFrame
+        filters: 包含 task_id, user_name, start_date, end_date 的字典，值为 None 表示不过滤
+
+    Returns:
+        与 tasks 等长的布尔 Series
+    """
+    mask = pd.Series(True, index=tasks.index)
+    if filters.get('task_id') is not None:
+        mask &= tasks['task_id'] == filters['task_id']
+    if filters.get('user_name') is not None:
+        # 用户通过 task_group 关联任务
+        users = get_user_info(db)
+        groups = users.loc[users['user_name'] == filters['user_name'], 'task_group']
+        mask &= tasks['task_group'].isin(groups)
+    if filters.get('start_date') is not None:
+        mask &= tasks['updated_at'] >= pd.Timestamp(filters['start_date'])
+    if filters.get('end_date') is not None:
+        # 结束日期包含当天
+        mask &= tasks['updated_at'] < pd.Timestamp(filters['end_date'] + timedelta(days=1))
+    return mask
+
+
+def build_task_filter(filters):
+    """
+    把页面筛选条件转换为 SQL WHERE 子句，语义与 filter_tasks 一致
+
+    Args:
+        filters: 包含 task_id, user_name, start_date, end_date 的字典，值为 None 表示不过滤
+
+    Returns:
+        (以 " WHERE" 开头的子句或空字符串, 参数元组)
+    """
+    conditions, params = [], []
+    if filters.get('task_id') is not None:
+        conditions.append("task_id = %s")
+        params.append(filters['task_id'])
+    if filters.get('user_name') is not None:
+        # 用户通过 task_group 关联任务
+        conditions.append("task_group IN (SELECT task_group FROM users WHERE user_name = %s)")
+        params.append(filters['user_name'])
+    if filters.get('start_date') is not None:
+        conditions.append("updated_at >= %s")
+        params.append(filters['start_date'])
+    if filters.get('end_date') is not None:
+        # 结束日期包含当天
+        conditions.append("updated_at < %s")
+        params.append(filters['end_date'] + timedelta(days=1))
+    if not conditions:
+        return "", ()
+    return " WHERE " + " AND ".join(conditions), tuple(params)
+
+
+def get_task_page(db, filters, page_size, after=None, before=None):
+    """
+    按 (updated_at, task_id) 键集分页获取一页任务
+
+    数据来自后台刷新的、按 (updated_at, task_id) 排好序的任务镜像，只有本页的行会被渲染。
+
+    Args:
+        db: 数据库管理器
+        filters: 页面筛选条件，见 filter_tasks
+        page_size: 每页行数
+        after: 上一页最后一行的 (updated_at, task_id)，取其后一页
+        before: 当前页第一行的 (updated_at, task_id)，取其前一页
+
+    Returns:
+        (本页任务 DataFrame, 该方向上是否还有更多数据)
+    """
+    try:
+        tasks = get_task_list(db)
+    except Exception as e:
+        st.error(f"获取任务列表失败: {e}")
+        return pd.DataFrame(), False
+
+    mask = filter_tasks(db, tasks, filters)
+    updated_at, task_id = tasks['updated_at'], tasks['task_id']
+    if after is not None:
+        mask &= (updated_at > after[0]) | ((updated_at == after[0]) & (task_id > after[1]))
+    elif before is not None:
+        mask &= (updated_at < before[0]) | ((updated_at == before[0]) & (task_id < before[1]))
+
+    matched = tasks[mask]
+    # 多取一行用于判断是否还有更多数据
+    rows = matched.tail(page_size + 1) if before is not None else matched.head(page_size + 1)
+    has_more = len(rows) > page_size
+    rows = rows.tail(page_size) if before is not None else rows.head(page_size)
+    return rows.reset_index(drop=True), has_more
+
+
+def page_key(tasks, position):
+    """取出分页键 (updated_at, task_id)，转换为可作为查询参数的 Python 值"""
+    updated_at = tasks['updated_at'].iloc[position]
+    if isinstance(updated_at, pd.Timestamp):
+        updated_at = updated_at.to_pydatetime()
+    task_id = tasks['task_id'].iloc[position]
+    if hasattr(task_id, 'item'):
+        task_id = task_id.item()
+    return updated_at, task_id
+
@@ -1,5 +1,8 @@
 import streamlit as st
+from components import edit_grid, export_button
 from lib import get_db
+from lib.scheduler import get_scheduler
+from lib.table_mirror import get_mirror
 
 def show_user_management():
     """显示用户管理页面"""
@@ -10,7 +13,16 @@ def show_user_management():
 
     """显示用户列表"""
     st.subheader("用户列表")
-    st.dataframe(users, height=800)
+    if st.toggle("编辑模式", key="user_edit_mode") and users is not None:
+        edit_grid(db, "users", "user_name", users.assign(is_running=users['is_running'].fillna(0).astype(bool)),
+                  USER_EDITABLE_COLUMNS, key="user_editor", refresh_job="users")
+    else:
+        st.dataframe(users, height=800)
+    st.caption(f"数据更新于 {get_user_info_age(db):.0f} 秒前")
+
+    # 用户列表没有筛选条件，导出整张表
+    with st.expander("导出用户列表"):
+        export_button(db, "users", f"{USER_INFO_SQL} ORDER BY user_name", key="user_export")
 
     # 添加新用户
     add_new_user(db)
@@ -35,12 +47,48 @@ def show_user_management():
 #         st.info("暂无用户")
 
 
+# 列表查询结果的缓存秒数，写入对应表时自动失效
+LIST_CACHE_TTL = 30
+
+USER_INFO_SQL = "select user_name, is_running, user_group, task_group, browser_name, browser_count, group_name, updated_at from users"
+
+# 用户镜像的字段（user_name 和 updated_at 自动加入）
+USER_MIRROR_COLUMNS = ("is_running", "user_group", "task_group", "browser_name", "browser_count", "group_name")
+
+# 用户列表后台刷新的间隔秒数
+USER_REFRESH_INTERVAL = 10
+
+# 编辑模式下可修改的字段
+USER_EDITABLE_COLUMNS = ("is_running",)
+
+
+def get_user_mirror(db):
+    """获取用户表的进程内镜像"""
+    return get_mirror(db, "users", "user_name", USER_MIRROR_COLUMNS)
+
+
+def register_user_job(db):
+    """注册用户列表的后台刷新任务（已注册时不做任何事）"""
+    get_scheduler().register("users", get_user_mirror(db).sync, USER_REFRESH_INTERVAL)
+
+
+def get_user_result(db):
+    """读取后台刷新的用户列表结果，首次调用时注册刷新任务"""
+    register_user_job(db)
+    return get_scheduler().get("users")
+
+
 def get_user_info(db):
-    try:
-        sql = "select user_name, is_running, user_group, task_group, browser_name, browser_count, group_name, updated_at from users"
-        return db.execute(sql)
-    except Exception as e:
-        st.error(f"获取用户列表失败: {e}")
+    result = get_user_result(db)
+    if result['error'] and result['value'] is None:
+        st.error(f"获取用户列表失败: {result['error']}")
+    return result['value']
+
+
+def get_user_info_age(db):
+    """用户列表结果距上次刷新的秒数"""
+    return get_user_result(db)['age'] or 0
+
 
 def add_new_user(db):
     """新用户注册函数"""
@@ -62,6 +110,8 @@ def add_new_user(db):
                         "password_hash": new_password,
                         "is_active": is_active
                     })
+                    # 让用户列表在下一轮调度时立即刷新
+                    get_scheduler().trigger("users")
                     st.success(f"用户 {new_username} 已添加，ID: {user_id}")
                 except Exception as e:
                     st.error(f"添加用户失败: {e}")
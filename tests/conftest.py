@@ -0,0 +1,179 @@
+import datetime
+import itertools
+import sqlite3
+
+import pymysql
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+
+class FakeServer:
+    """用 SQLite 内存库模拟一台 MySQL 服务器，按 host 区分"""
+
+    def __init__(self, host):
+        self.host = host
+        self.db = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None,
+                                  detect_types=sqlite3.PARSE_DECLTYPES)
+        self.reachable = True
+        self.queries = []
+        # 被 KILL QUERY 的连接线程ID
+        self.killed = []
+
+    def run(self, query, params=None):
+        """在该服务器上直接执行语句，用于准备数据"""
+        return self.db.execute(query.replace('%s', '?'), tuple(params or ())).fetchall()
+
+
+def _type_code(value):
+    if isinstance(value, datetime.datetime):
+        return FIELD_TYPE.DATETIME
+    if isinstance(value, int):
+        return FIELD_TYPE.LONGLONG
+    if isinstance(value, float):
+        return FIELD_TYPE.DOUBLE
+    return FIELD_TYPE.VAR_STRING
+
+
+class FakeCursor:
+    def __init__(self, connection, cursor_class):
+        self.connection = connection
+        self.dict_rows = cursor_class is None or issubclass(cursor_class, pymysql.cursors.DictCursorMixin)
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = []
+        self._executed = None
+
+    def execute(self, query, params=None):
+        server = self.connection.server
+        server.queries.append(query)
+        if query.startswith('KILL QUERY'):
+            server.killed.append(int(query.split()[-1]))
+            self.description = None
+            self.rowcount = 0
+            return 0
+        if params is not None and not isinstance(params, (tuple, list)):
+            params = (params,)
+        try:
+            cursor = server.db.execute(query.replace('%s', '?'), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise pymysql.err.ProgrammingError(1146, str(e)) from e
+        rows = cursor.fetchall()
+        self.description = None
+        if cursor.description:
+            first = rows[0] if rows else (None,) * len(cursor.description)
+            self.description = tuple((column[0], _type_code(value), None, None, None, None, None)
+                                     for column, value in zip(cursor.description, first))
+        self._rows = [dict(zip([d[0] for d in self.description], row)) if self.dict_rows else row
+                      for row in rows]
+        self.rowcount = len(rows) if cursor.description else cursor.rowcount
+        self.lastrowid = cursor.lastrowid
+        self._executed = query
+        return self.rowcount
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeConnection:
+    _thread_ids = itertools.count(1)
+
+    def __init__(self, server, cursorclass=None, autocommit=True, **kwargs):
+        self.server = server
+        self.cursorclass = cursorclass
+        self.autocommit_mode = autocommit
+        self.open = True
+        self._thread_id = next(self._thread_ids)
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self, cursor_class or self.cursorclass)
+
+    def get_autocommit(self):
+        return self.autocommit_mode
+
+    def thread_id(self):
+        return self._thread_id
+
+    def ping(self, reconnect=False):
+        if not self.server.reachable:
+            raise pymysql.err.OperationalError(2013, "Lost connection")
+
+    def begin(self):
+        self.server.db.execute("BEGIN")
+
+    def commit(self):
+        if self.server.db.in_transaction:
+            self.server.db.execute("COMMIT")
+
+    def rollback(self):
+        if self.server.db.in_transaction:
+            self.server.db.execute("ROLLBACK")
+
+    def close(self):
+        self.open = False
+
+    def literal(self, value):
+        if value is None:
+            return 'NULL'
+        if isinstance(value, (int, float)):
+            return str(value)
+        return "'" + str(value).replace("'", "''") + "'"
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    """
+    模拟的主库和副本：{'primary': FakeServer, 'replica': FakeServer}
+
+    pymysql.connect 按 host 连到对应的服务器，不可达的服务器连接时抛出 OperationalError。
+    """
+    servers = {host: FakeServer(host) for host in ('primary', 'replica')}
+
+    def connect(host=None, **kwargs):
+        server = servers[host]
+        if not server.reachable:
+            raise pymysql.err.OperationalError(2003, f"Can't connect to MySQL server on '{host}'")
+        return FakeConnection(server, **kwargs)
+
+    monkeypatch.setattr(pymysql, 'connect', connect)
+    return servers
+
+
+@pytest.fixture
+def make_db(servers):
+    """创建以 primary 为主库、replica 为副本的 DatabaseManager"""
+    from lib.db_manager import DatabaseManager
+
+    created = []
+
+    def make(query_timeout=None, **routing):
+        db = DatabaseManager(
+            config={'host': 'primary', 'port': 3306, 'user': 'test', 'password': '', 'database': 'test',
+                    'query_timeout': query_timeout},
+            pool_config={'min_size': 1, 'max_size': 4},
+            replicas=[{'host': 'replica'}],
+            routing_config=routing,
+        )
+        created.append(db)
+        return db
+
+    yield make
+    for db in created:
+        db.close()
@@ -0,0 +1,22 @@
+from datetime import date, datetime
+
+import numpy as np
+from pymysql.constants import FIELD_TYPE
+
+from lib.db_manager import _to_array
+
+
+def test_zero_dates_become_nat():
+    values = (datetime(2024, 1, 2, 3, 4, 5), '0000-00-00 00:00:00', None)
+    array = _to_array(values, FIELD_TYPE.DATETIME)
+    assert array.dtype == np.dtype('datetime64[us]')
+    assert array[0] == np.datetime64('2024-01-02T03:04:05')
+    assert np.isnat(array[1]) and np.isnat(array[2])
+
+    array = _to_array((date(2024, 1, 2), '0000-00-00'), FIELD_TYPE.DATE)
+    assert array[0] == np.datetime64('2024-01-02') and np.isnat(array[1])
+
+
+def test_far_future_dates_and_unsigned_bigints_are_kept():
+    assert str(_to_array((datetime(9999, 12, 31),), FIELD_TYPE.DATETIME)[0]).startswith('9999-12-31')
+    assert _to_array((2 ** 64 - 1,), FIELD_TYPE.LONGLONG)[0] == 2 ** 64 - 1
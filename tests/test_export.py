@@ -0,0 +1,28 @@
+import gzip
+import io
+
+from lib.export import export_query
+
+
+def test_export_streams_to_an_open_file(servers, make_db):
+    for server in servers.values():
+        server.run("CREATE TABLE users (user_name TEXT, is_running INTEGER)")
+        for i in range(25):
+            server.run("INSERT INTO users VALUES (%s, %s)", (f"u{i:02d}", i % 2))
+    db = make_db(query_timeout=5)
+
+    out = export_query(db, "SELECT user_name, is_running FROM users ORDER BY user_name", chunk_size=10,
+                       compress=True)
+    try:
+        assert isinstance(out, io.RawIOBase)
+        lines = gzip.decompress(out.read()).decode('utf-8-sig').splitlines()
+    finally:
+        out.close()
+
+    assert lines[0] == 'user_name,is_running'
+    assert lines[1:3] == ['u00,0', 'u01,1']
+    assert len(lines) == 26
+    # 流式读取不受默认查询超时限制
+    streamed = [query for server in servers.values() for query in server.queries
+                if 'ORDER BY user_name' in query and 'described' not in query]
+    assert streamed and not any('MAX_EXECUTION_TIME' in query for query in streamed)
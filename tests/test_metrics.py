@@ -0,0 +1,32 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from lib.metrics import DashboardMetrics, table_counts
+
+
+def test_table_counts_from_mirror_frame():
+    today = datetime.combine(date.today(), datetime.min.time())
+    frame = pd.DataFrame({
+        'task_id': [1, 2, 3, 4],
+        'is_run': [1, 0, None, 1],
+        'task_group': ['a', 'a', None, 'b'],
+        'updated_at': [today + timedelta(hours=1), today - timedelta(seconds=1), pd.NaT, today],
+    })
+
+    counts = table_counts(frame, 'is_run')
+
+    assert counts['total'] == 4
+    assert counts['active'] == 2
+    assert counts['updated_today'] == 2
+    assert counts['groups'] == {'a': {'total': 2, 'active': 1}, '-': {'total': 1, 'active': 0},
+                                'b': {'total': 1, 'active': 1}}
+
+
+def test_counts_are_reused_until_the_mirror_changes():
+    frame = pd.DataFrame({'is_run': [1], 'task_group': ['a'], 'updated_at': [datetime(2024, 1, 1)]})
+    metrics = DashboardMetrics()
+
+    first = metrics.counts('tasks', frame, 'is_run')
+    assert metrics.counts('tasks', frame, 'is_run') is first
+    assert metrics.counts('tasks', frame.copy(), 'is_run') is not first
@@ -0,0 +1,41 @@
+import time
+
+import pymysql
+import pytest
+
+from lib.db_manager import QueryTimeoutError
+
+
+def test_write_past_deadline_is_killed_and_reported_as_timeout(servers, make_db):
+    db = make_db()
+    connection = db.pool.acquire()
+    try:
+        with pytest.raises(QueryTimeoutError):
+            with db._guard(db.pool, connection, "UPDATE tasks SET is_run = 0", 0.05, cancellable=False):
+                deadline = time.monotonic() + 2
+                while connection.thread_id() not in servers['primary'].killed and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                raise pymysql.err.OperationalError(1317, "Query execution was interrupted")
+    finally:
+        db.pool.release(connection)
+    assert connection.thread_id() in servers['primary'].killed
+
+
+def test_disconnect_during_guarded_write_is_not_reported_as_timeout(servers, make_db):
+    db = make_db()
+    connection = db.pool.acquire()
+    try:
+        with pytest.raises(pymysql.err.OperationalError) as raised:
+            with db._guard(db.pool, connection, "UPDATE tasks SET is_run = 0", 5, cancellable=False):
+                raise pymysql.err.OperationalError(2013, "Lost connection to MySQL server during query")
+    finally:
+        db.pool.release(connection)
+    assert not isinstance(raised.value, QueryTimeoutError)
+    assert servers['primary'].killed == []
+
+
+def test_execute_non_query_accepts_timeout(servers, make_db):
+    servers['primary'].run("CREATE TABLE writes (id INTEGER PRIMARY KEY)")
+    db = make_db()
+    assert db.execute_non_query("INSERT INTO writes (id) VALUES (1)", timeout=5) == 1
+    assert db.watchdog.stats()['watched'] == 0
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from lib.query_stats import set_page
+from lib.table_mirror import TableMirror
+
+
+def _mark_servers(servers):
+    for host, server in servers.items():
+        server.run("CREATE TABLE marker (server TEXT)")
+        server.run("INSERT INTO marker VALUES (%s)", (host,))
+        server.run("CREATE TABLE writes (id INTEGER PRIMARY KEY)")
+
+
+def _served_by(db):
+    return db.execute("SELECT server FROM marker")[0]['server']
+
+
+def test_unreachable_replica_does_not_block_startup(servers, make_db):
+    _mark_servers(servers)
+    servers['replica'].reachable = False
+
+    db = make_db()
+
+    assert _served_by(db) == 'primary'
+    stats = db.routing_stats()
+    assert stats['replica_failures'] == 1
+    assert stats['replica_pools'][0]['down']
+
+
+def test_background_write_only_pins_its_own_job(servers, make_db):
+    _mark_servers(servers)
+    db = make_db(sticky_seconds=60)
+    try:
+        set_page("scheduler:writer")
+        db.execute_non_query("INSERT INTO writes (id) VALUES (1)")
+        assert _served_by(db) == 'primary'
+
+        set_page("scheduler:reader")
+        assert _served_by(db) == 'replica'
+    finally:
+        set_page(None)
+
+
+def test_concurrent_queries_follow_caller_writes(servers, make_db):
+    _mark_servers(servers)
+    db = make_db(sticky_seconds=60)
+    try:
+        set_page("scheduler:writer")
+        db.execute_non_query("INSERT INTO writes (id) VALUES (1)")
+        results, _ = db.execute_concurrent({'a': "SELECT server FROM marker"})
+        assert results['a'][0]['server'] == 'primary'
+    finally:
+        set_page(None)
+
+
+def test_mirror_keeps_rows_missing_from_lagging_replica(servers, make_db):
+    for server in servers.values():
+        server.run("CREATE TABLE tasks (task_id INTEGER PRIMARY KEY, task_name TEXT, updated_at TIMESTAMP)")
+        for task_id in (1, 2, 3):
+            server.run("INSERT INTO tasks VALUES (%s, %s, %s)", (task_id, f"t{task_id}", datetime(2024, 1, 1)))
+    db = make_db()
+    mirror = TableMirror(db, 'tasks', 'task_id', ('task_name',), delete_check_interval=0)
+    mirror.refresh()
+    assert sorted(mirror.sync()['task_id'].tolist()) == [1, 2, 3]
+
+    # 3 在两边都已删除；2 只是副本还没追上
+    for server in servers.values():
+        server.run("DELETE FROM tasks WHERE task_id = 3")
+    servers['replica'].run("DELETE FROM tasks WHERE task_id = 2")
+
+    replica_reads = db.routing_stats()['replica_reads']
+    frame = mirror.sync()
+
+    assert sorted(frame['task_id'].tolist()) == [1, 2]
+    # 拉取变化和主键比对在同一个副本连接上完成
+    assert db.routing_stats()['replica_reads'] == replica_reads + 1
@@ -0,0 +1,21 @@
+from datetime import date, datetime
+
+from lib.rollups import DAILY_TABLE, EVENT_TABLE, HOURLY_TABLE, ActivityRollup, activity_range
+
+
+def test_range_ending_today_reads_hourly_buckets_for_today():
+    now = datetime(2024, 3, 10, 14, 25)
+    plan = ActivityRollup.plan(*activity_range(date(2024, 3, 1), date(2024, 3, 10), now))
+
+    assert plan == [
+        (DAILY_TABLE, datetime(2024, 3, 1), datetime(2024, 3, 10)),
+        (HOURLY_TABLE, datetime(2024, 3, 10), datetime(2024, 3, 10, 14)),
+        (EVENT_TABLE, datetime(2024, 3, 10, 14), now),
+    ]
+
+
+def test_past_range_reads_only_daily_buckets():
+    now = datetime(2024, 3, 10, 14, 25)
+    plan = ActivityRollup.plan(*activity_range(date(2024, 3, 1), date(2024, 3, 5), now))
+
+    assert plan == [(DAILY_TABLE, datetime(2024, 3, 1), datetime(2024, 3, 6))]
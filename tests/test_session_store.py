@@ -0,0 +1,9 @@
+from lib.session_store import SessionStore
+
+
+def test_issue_survives_missing_session_table(servers, make_db):
+    store = SessionStore(make_db(), secret='test-secret')
+
+    token = store.issue({'username': 'admin'})
+
+    assert store.resolve(token) == {'username': 'admin'}
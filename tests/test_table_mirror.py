@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from lib.table_mirror import TableMirror
+
+
+def _insert(servers, task_id, updated_at):
+    for server in servers.values():
+        server.run("INSERT INTO tasks VALUES (%s, %s, %s)", (task_id, f"t{task_id}", updated_at))
+
+
+def test_mirror_picks_up_rows_committed_behind_the_watermark(servers, make_db):
+    for server in servers.values():
+        server.run("CREATE TABLE tasks (task_id INTEGER PRIMARY KEY, task_name TEXT, updated_at TIMESTAMP)")
+    _insert(servers, 1, datetime(2024, 1, 1, 10, 0, 5))
+    mirror = TableMirror(make_db(), 'tasks', 'task_id', ('task_name',), settle_seconds=60)
+    mirror.sync()
+
+    # 事务在 10:00:03 取得 updated_at，但在水位越过它之后才提交
+    _insert(servers, 2, datetime(2024, 1, 1, 10, 0, 3))
+
+    assert sorted(mirror.sync()['task_id'].tolist()) == [1, 2]
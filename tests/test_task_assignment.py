@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import numpy as np
+
+from lib.task_assignment import TaskAssigner
+
+
+def _assignments(users):
+    names = [name for name, count in users for _ in range(count)]
+    indexes = [index for _, count in users for index in range(count)]
+    return {'user_name': np.array(names, dtype=object), 'browser_index': np.array(indexes),
+            'task_id': np.arange(len(names)) + 1}
+
+
+def test_rows_not_written_in_this_run_are_removed(servers, make_db, monkeypatch):
+    server = servers['primary']
+    server.run("CREATE TABLE task_assignments (user_name TEXT NOT NULL, browser_index INTEGER NOT NULL, "
+               "task_id INTEGER NOT NULL, assigned_at TIMESTAMP NOT NULL, PRIMARY KEY (user_name, browser_index))")
+    db = make_db()
+    db._schemas['task_assignments'] = dict.fromkeys(['user_name', 'browser_index', 'task_id', 'assigned_at'])
+    monkeypatch.setattr(db, 'max_allowed_packet', lambda: 1 << 20)
+    # 模拟的服务器不支持 FOR UPDATE 和 ON DUPLICATE KEY UPDATE
+    monkeypatch.setattr(db, 'upsert_many', lambda table, rows, columns, batch_size: db._bulk_write(
+        table, rows, batch_size, " ON CONFLICT (user_name, browser_index) DO UPDATE SET "
+                                 "task_id = excluded.task_id, assigned_at = excluded.assigned_at"))
+    execute = db.execute
+
+    def latest(query, *args, **kwargs):
+        # SQLite 的聚合结果不带类型，按字符串返回
+        rows = execute(query.replace(" FOR UPDATE", ""), *args, **kwargs)
+        return [{'latest': row['latest'] and datetime.fromisoformat(row['latest'])} for row in rows]
+
+    monkeypatch.setattr(db, 'execute', latest)
+    assigner = TaskAssigner(db)
+
+    assigner.write_assignments(_assignments([('alice', 3), ('bob', 2)]))
+    # bob 停止运行，alice 的浏览器减少到 1 个；同一秒内再次分配
+    result = assigner.write_assignments(_assignments([('alice', 1)]))
+
+    assert result['deleted'] == 4
+    assert server.run("SELECT user_name, browser_index FROM task_assignments") == [('alice', 0)]